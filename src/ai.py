@@ -1,16 +1,59 @@
+import atexit
+import ctypes
+import math
+import multiprocessing
+import os
+import pickle
 import random
+import time
+from multiprocessing.sharedctypes import RawValue
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from book import OpeningBook
+from tablebase import Tablebases, MAX_PIECES as TABLEBASE_PIECES
+from ordering import MoveOrderer
+from evaluation import evaluate, PIECE_VALUES, PAWN_VALUE
+from move import is_promotion, is_quiet, EN_PASSANT, NO_MOVE
+from engine import FIFTY_MOVE_PLIES
 
-piece_values = {
-    "K": 0,
-    "Q": 9,
-    "R": 5,
-    "B": 3,
-    "N": 3,
-    "P": 1
-}
-CHECKMATE = 1000
+CHECKMATE = 100000
 STALEMATE = 0
-DEPTH = 2
+DRAW = 0
+INFINITY = CHECKMATE + 1
+MAX_DEPTH = 64
+MAX_PLY = 128
+TIME_LIMIT = 1.0  # Default thinking time in seconds
+HASH_SIZE_MB = 16
+DELTA_MARGIN = 200  # Positional slack allowed for in delta pruning
+WORKERS = 1  # Search processes, more than one searches in parallel
+
+# Selective search, each part switchable to measure what it is worth
+NULL_MOVE_PRUNING = True
+LATE_MOVE_REDUCTIONS = True
+FUTILITY_PRUNING = True
+RAZORING = True
+PRUNING_OPTIONS = ("null_move", "late_move_reductions", "futility", "razoring")  # Search attributes
+NULL_MOVE_DEPTH = 3  # Least depth to try a null move at
+NULL_MOVE_REDUCTION = 2  # Plies the null move search is shallower, one more every 6 plies of depth
+LMR_DEPTH = 3  # Least depth to reduce late moves at
+LMR_MOVES = 3  # Moves searched at full depth before the rest are reduced
+# Plies a late move is reduced by, growing with the depth and its place in the move order
+LMR_REDUCTIONS = [[0] * 64] + [[0] + [max(1, int(0.75 + math.log(depth) * math.log(count) / 2.25))
+                                      for count in range(1, 64)] for depth in range(1, 64)]
+FUTILITY_MARGINS = (0, 150, 300)  # By depth: how far below alpha a quiet move can't lift the score
+RAZOR_MARGINS = (0, 300, 500)  # By depth: how far below alpha the position is left to quiescence
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "books", "book.bin")
+
+transposition_table = TranspositionTable(HASH_SIZE_MB)
+opening_book = None  # Opened on first use, False when there is no book file
+tablebases = Tablebases()  # Empty until generated with tablebase.py
+
+# Parallel search state: the worker pool, the transposition table it shares
+# and a flag telling the helpers to stop
+worker_pool = None
+worker_count = 0
+worker_hash_mb = HASH_SIZE_MB  # Size of the shared table
+shared_table = None
+helpers_stop = None
 
 '''
 Get a random move from the list of valid moves
@@ -22,102 +65,501 @@ def get_random_move(valid_moves):
 
 
 '''
-def get_best_move(game_state, valid_moves):
-    turn_multiplier = 1 if game_state.white_to_move else -1
+Get the best move from the list of valid moves
+
+Searches with iterative deepening until max_depth is reached or the time
+(seconds) or node budget runs out, and returns the best move of the last
+completed iteration. Setting stop_flag.value from another thread or
+process stops the search early. info(search) is called after every
+completed iteration.
+
+Positions in the opening book are answered with a book move instead,
+unless use_book is off, and positions in the endgame tablebases with the
+move that mates fastest (or holds the draw, or delays mate longest).
+'''
+
+
+def get_best_move(game_state, valid_moves, time_limit=TIME_LIMIT, node_limit=None, max_depth=MAX_DEPTH,
+                  workers=None, stop_flag=None, info=None, use_book=True):
+    if len(valid_moves) == 0:
+        return None
+    if use_book:
+        move = get_book_move(game_state, valid_moves)
+        if move is not None:
+            return move
+    move = get_tablebase_move(game_state, valid_moves)
+    if move is not None:
+        return move
+    if workers is None:
+        workers = WORKERS
+    if workers > 1:
+        return parallel_search(game_state, valid_moves, time_limit, node_limit, max_depth, workers,
+                               stop_flag, info)[0]
+    transposition_table.new_search()
+    search = Search(game_state, transposition_table, time_limit, node_limit, stop_flag, info)
+    return search.iterative_deepening(valid_moves, max_depth)
+
+
+'''
+Get a move from the opening book (BOOK_FILE), or None when the position
+is not in it or there is no book
+'''
+
+
+def get_book_move(game_state, valid_moves):
+    global opening_book
+    if opening_book is None:
+        opening_book = OpeningBook(BOOK_FILE) if os.path.exists(BOOK_FILE) else False
+    if not opening_book:
+        return None
+    return opening_book.choose(game_state, valid_moves)
+
+
+'''
+Get the best move from the endgame tablebases, or None when the position
+is not in them
+'''
+
+
+def get_tablebase_move(game_state, valid_moves):
+    if not tablebases or tablebases.probe(game_state) is None:
+        return None
     best_move = None
-    random.shuffle(valid_moves)
-    opponent_minmax_score = CHECKMATE
+    best_rank = None
     for move in valid_moves:
         game_state.make_move(move)
-        opponent_moves = game_state.get_valid_moves()
-        if game_state.checkmate:
-            opponent_maxscore = -CHECKMATE
-        elif game_state.stalemate:
-            opponent_maxscore = STALEMATE 
-        else:
-            opponent_maxscore = -CHECKMATE
-            for opponent_move in opponent_moves:
-                game_state.make_move(opponent_move)
-                game_state.get_valid_moves()
-                if game_state.checkmate:
-                    score = CHECKMATE
-                elif game_state.stalemate:
-                    score = STALEMATE
-                else:
-                    score = -turn_multiplier * score_material(game_state.board)
-                if score > opponent_minmax_score:
-                    opponent_minmax_score = score
-                game_state.undo_move()
-        if opponent_maxscore < opponent_minmax_score:
-            opponent_minmax_score = opponent_maxscore
-            best_move = move
+        result = tablebases.probe(game_state)
         game_state.undo_move()
-
+        if result is None:
+            return None
+        # The opponent's result: a fast loss for them is best, a slow win worst
+        rank = (-result[0], -result[1] if result[0] < 0 else result[1])
+        if best_rank is None or rank > best_rank:
+            best_move, best_rank = move, rank
     return best_move
+
+
 '''
-'''
-Get the best move from the list of valid moves
+Parallel search (Lazy SMP)
+
+Every worker runs its own iterative deepening search of the whole tree and
+they share one transposition table in shared memory, so each finds the
+results of the others and skips that work. The helpers start at different
+depths and try the root moves in different orders to spread out. The main
+search runs in this process and decides when to stop; the move from the
+deepest completed iteration is played.
+
+Returns (best move, score, completed depth, nodes searched by all workers).
 '''
 
 
-def get_best_move(game_state, valid_moves):
-    global next_move
-    next_move = None
-    get_minmax_move(game_state, valid_moves, DEPTH, game_state.white_to_move)    
-    return next_move
+def parallel_search(game_state, valid_moves, time_limit=TIME_LIMIT, node_limit=None, max_depth=MAX_DEPTH,
+                    workers=WORKERS, stop_flag=None, info=None):
+    start_workers(workers)
+    shared_table.new_search()
+    helpers_stop.value = False
+    if node_limit is not None:
+        node_limit = max(node_limit // workers, 1)
 
+    # The pool sends tasks from a background thread, so the position is
+    # pickled here before this process starts making moves on it
+    position = pickle.dumps(game_state)
+    helpers = [worker_pool.apply_async(helper_search, (position, valid_moves, time_limit, node_limit,
+                                                       max_depth, helper, shared_table.age))
+               for helper in range(1, workers)]
+    search = Search(game_state, shared_table, time_limit, node_limit, stop_flag, info)
+    best_move = search.iterative_deepening(valid_moves, max_depth)
+    helpers_stop.value = True
 
-'''
-Get best move using minmax recursively
-'''
+    best_score = search.best_score
+    best_depth = search.completed_depth
+    nodes = search.nodes
+    for helper in helpers:
+        move, score, depth, helper_nodes = helper.get()
+        nodes += helper_nodes
+        if depth > best_depth:
+            best_move, best_score, best_depth = move, score, depth
+    return best_move, best_score, best_depth, nodes
+
+
+def start_workers(workers, hash_mb=None):
+    '''
+    Starts the pool of workers - 1 helper processes, unless it is running
+    with that many already. hash_mb resizes the shared table, which means
+    restarting the pool as the helpers get it when they start; by default
+    it keeps its size.
+    '''
+    global worker_pool, worker_count, worker_hash_mb, shared_table, helpers_stop
+    if hash_mb is None:
+        hash_mb = worker_hash_mb
+    if worker_pool is not None and worker_count == workers and worker_hash_mb == hash_mb:
+        return
+    stop_workers()
+    shared_table = TranspositionTable(hash_mb, shared=True)
+    worker_hash_mb = hash_mb
+    helpers_stop = RawValue(ctypes.c_bool, False)
+    worker_pool = multiprocessing.Pool(workers - 1, init_worker, (shared_table, helpers_stop))
+    worker_count = workers
+
+
+def stop_workers():
+    global worker_pool, worker_count
+    if worker_pool is not None:
+        worker_pool.terminate()
+        worker_pool.join()
+        worker_pool = None
+        worker_count = 0
+
+
+atexit.register(stop_workers)
+
+
+def init_worker(table, flag):
+    global shared_table, helpers_stop
+    shared_table = table
+    helpers_stop = flag
+
+
+def helper_search(position, valid_moves, time_limit, node_limit, max_depth, helper, age):
+    shared_table.age = age
+    search = Search(pickle.loads(position), shared_table, time_limit, node_limit, helpers_stop)
+    move = search.iterative_deepening(valid_moves, max_depth, helper)
+    return move, search.best_score, search.completed_depth, search.nodes
+
+
+class Search:
+    """
+    Negamax alpha-beta search. Scores are from the side to move's point of
+    view; mates are scored CHECKMATE minus the distance in plies so the
+    shortest mate is preferred.
+    """
+
+    def __init__(self, game_state, transposition_table, time_limit=None, node_limit=None, stop_flag=None,
+                 info=None):
+        self.game_state = game_state
+        self.transposition_table = transposition_table
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.stop_flag = stop_flag  # Shared flag another process sets to stop the search
+        self.info = info  # Called with the search after every completed iteration
+        self.start_time = time.perf_counter()
+        self.nodes = 0
+        self.ordering = MoveOrderer(MAX_PLY)
+        self.stopped = False
+        self.completed_depth = 0
+        self.best_move = None
+        self.best_score = 0
+        self.tablebases = tablebases if tablebases else None
+        self.null_move = NULL_MOVE_PRUNING
+        self.late_move_reductions = LATE_MOVE_REDUCTIONS
+        self.futility = FUTILITY_PRUNING
+        self.razoring = RAZORING
 
+    def iterative_deepening(self, valid_moves, max_depth=MAX_DEPTH, helper=0):
+        """
+        Searches depth 1, 2, ... and returns the best move of the deepest
+        completed iteration. The previous best move is searched first.
 
-def get_minmax_move(game_state, valid_moves, depth, white_to_move):
-    if depth == 0:
-        return score_material(game_state)
-    
-    if white_to_move:
-        max_score = -CHECKMATE
-        for move in valid_moves:
+        Helpers of a parallel search (helper > 0) shuffle the root moves
+        after the first and every other one starts a ply deeper.
+        """
+        moves = list(valid_moves)
+        entry = self.transposition_table.probe(self.game_state.zobrist_key)
+        self.ordering.order(self.game_state, moves, 0, entry[3] if entry is not None else 0)
+        if helper:
+            rest = moves[1:]
+            random.Random(helper).shuffle(rest)
+            moves[1:] = rest
+        self.best_move = moves[0]
+        for depth in range(1 + helper % 2, max_depth + 1):
+            move, score = self.search_root(moves, depth)
+            if self.stopped:
+                break
+            self.best_move = move
+            self.best_score = score
+            self.completed_depth = depth
+            moves.remove(move)
+            moves.insert(0, move)
+            if self.info is not None:
+                self.info(self)
+            # A found mate won't get any shorter, and a new iteration is not
+            # worth starting when it can't finish in time
+            if abs(score) >= CHECKMATE - MAX_PLY:
+                break
+            if self.time_limit is not None and self.elapsed() * 2 > self.time_limit:
+                break
+        return self.best_move
+
+    def search_root(self, moves, depth):
+        game_state = self.game_state
+        alpha = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            game_state.make_move(move)
+            score = -self.negamax(depth - 1, -INFINITY, -alpha, 1)
+            game_state.undo_move()
+            if self.stopped:
+                break
+            if score > alpha:
+                alpha = score
+                best_move = move
+        return best_move, alpha
+
+    def negamax(self, depth, alpha, beta, ply, null_allowed=True):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+        if self.stopped:
+            return 0
+        game_state = self.game_state
+
+        # A repeated position is a draw: the side that could improve on it
+        # would have done so the first time, so the cycle isn't searched again
+        if game_state.is_repetition():
+            return DRAW
+        if game_state.halfmove_clock >= FIFTY_MOVE_PLIES:
+            return -CHECKMATE + ply if game_state.in_check() and not game_state.get_valid_moves() else DRAW
+
+        if self.tablebases is not None and bin(game_state.bitboards.occupied).count("1") <= TABLEBASE_PIECES:
+            result = self.tablebases.probe(game_state)
+            if result is not None:
+                if result[0] > 0:
+                    return CHECKMATE - ply - result[1]
+                return -CHECKMATE + ply + result[1] if result[0] < 0 else STALEMATE
+
+        key = game_state.zobrist_key
+        entry = self.transposition_table.probe(key)
+        hash_move = 0
+        if entry is not None:
+            hash_move = entry[3]
+            if entry[0] >= depth:
+                score = score_from_table(entry[1], ply)
+                bound = entry[2]
+                if (bound == EXACT or (bound == LOWER_BOUND and score >= beta) or
+                        (bound == UPPER_BOUND and score <= alpha)):
+                    return score
+
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+
+        # Selective search guesses from the static score, which means
+        # nothing in check, and never where a mate score is at stake
+        in_check = game_state.in_check()
+        selective = not in_check and -CHECKMATE + MAX_PLY < alpha and beta < CHECKMATE - MAX_PLY
+        static_eval = self.evaluate() if selective else -INFINITY
+
+        # Razoring: far below alpha near the leaves, only a capture could
+        # help, so quiescence decides
+        if self.razoring and selective and depth < len(RAZOR_MARGINS) and \
+                static_eval + RAZOR_MARGINS[depth] <= alpha:
+            score = self.quiescence(alpha, alpha + 1, ply)
+            if score <= alpha:
+                return score
+
+        # Null move pruning: if passing still fails high, a real move would
+        # too. Not with only pawns left, where having to move can be the
+        # problem (zugzwang), and never twice in a row
+        if self.null_move and null_allowed and selective and depth >= NULL_MOVE_DEPTH and static_eval >= beta \
+                and game_state.has_non_pawn_material():
+            game_state.make_null_move()
+            score = -self.negamax(depth - 1 - NULL_MOVE_REDUCTION - depth // 6, -beta, -beta + 1, ply + 1, False)
+            game_state.undo_null_move()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return beta
+
+        # Futility pruning: at the frontier, quiet moves can't make up the
+        # distance to alpha
+        futility_value = static_eval + FUTILITY_MARGINS[depth] if depth < len(FUTILITY_MARGINS) else INFINITY
+        futile = self.futility and selective and futility_value <= alpha
+        reduce = self.late_move_reductions and not in_check and depth >= LMR_DEPTH
+
+        # Moves are generated stage by stage, so a cutoff early on skips
+        # generating the rest
+        ordering = self.ordering
+        killers = ordering.killers[ply]
+        moves = game_state.generate_staged_moves(
+            hash_move, killers, ordering.history[0 if game_state.white_to_move else 1])
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = NO_MOVE
+        searched = 0
+        for move in moves:
             game_state.make_move(move)
-            
-            next_move = game_state.get_valid_moves()
-            score = get_minmax_move(game_state, next_move, depth - 1, False)
-            
-            if score > max_score:
-                max_score = score
-                if depth == DEPTH:
-                    next_move == move
-            
+            # Late quiet moves that don't give check are pruned or reduced
+            late_quiet = (searched and (futile or (reduce and searched >= LMR_MOVES)) and is_quiet(move)
+                          and move not in killers and not game_state.in_check())
+            if late_quiet and futile:
+                game_state.undo_move()
+                # Still a bound: the move can't score above the futility value
+                best_score = max(best_score, futility_value)
+                continue
+            if late_quiet:
+                # Searched shallower with a null window first, and again in
+                # full only if it unexpectedly beats alpha
+                reduction = min(LMR_REDUCTIONS[min(depth, 63)][min(searched, 63)], depth - 2)
+                score = -self.negamax(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if score > alpha:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
             game_state.undo_move()
-        return max_score
-    else:
-        min_score = CHECKMATE
-        for move in valid_moves:
+            searched += 1
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        ordering.record_cutoff(game_state, move, ply, depth)
+                        break
+
+        # The first move is never pruned, so no move searched means none legal
+        if best_move == NO_MOVE:
+            return -CHECKMATE + ply if in_check else STALEMATE
+
+        if best_score <= alpha_orig:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        Searches captures and promotions until the position is quiet, so
+        the static evaluation is never taken in the middle of an exchange.
+        The side to move may stand pat on the static score, except in check
+        where every evasion is searched.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+        if self.stopped:
+            return 0
+        game_state = self.game_state
+
+        in_check = game_state.in_check()
+        if in_check:
+            moves = game_state.get_valid_moves()
+            if len(moves) == 0:
+                return -CHECKMATE + ply
+            best_score = -INFINITY
+        else:
+            stand_pat = self.evaluate()
+            if stand_pat >= beta or ply >= MAX_PLY - 1:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best_score = stand_pat
+            moves = game_state.get_capture_moves()
+        self.ordering.order(game_state, moves, ply)
+
+        squares = game_state.bitboards.squares
+        for move in moves:
+            # Delta pruning: skip captures that can't lift the score to alpha
+            # even when winning the piece with a margin to spare
+            if not in_check and not is_promotion(move):
+                victim = squares[move >> 6 & 63]
+                gain = PAWN_VALUE if move >> 12 == EN_PASSANT else PIECE_VALUES[victim % 6]
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
             game_state.make_move(move)
-            
-            next_move = game_state.get_valid_moves()
-            score = get_minmax_move(game_state, next_move, depth - 1, True)
-            
-            if score < min_score:
-                min_score = score
-                if depth == DEPTH:
-                    next_move == move
-            
+            score = -self.quiescence(-beta, -alpha, ply + 1)
             game_state.undo_move()
-        return min_score
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
 
+    def evaluate(self):
+        score = score_material(self.game_state)
+        return score if self.game_state.white_to_move else -score
 
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def check_limits(self):
+        """
+        Stops the search once the time or node budget is used up. The first
+        iteration always completes so there is a searched move to return,
+        unless the stop flag says the move is no longer needed.
+        """
+        if self.stop_flag is not None and self.stop_flag.value:
+            self.stopped = True
+        elif self.completed_depth == 0:
+            return
+        elif self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.time_limit is not None and self.elapsed() >= self.time_limit:
+            self.stopped = True
+
+
+'''
+Get the principal variation: the best move followed by the hash moves
+stored for the positions it leads to, as long as they are legal and don't
+repeat a position.
+'''
+
+
+def principal_variation(game_state, table, best_move, max_length=MAX_DEPTH):
+    pv = [best_move]
+    seen = {game_state.zobrist_key}
+    game_state.make_move(best_move)
+    while len(pv) < max_length and game_state.zobrist_key not in seen:
+        seen.add(game_state.zobrist_key)
+        entry = table.probe(game_state.zobrist_key)
+        if entry is None or not entry[3] or not game_state.is_legal_move(entry[3]):
+            break
+        pv.append(entry[3])
+        game_state.make_move(entry[3])
+    for _ in pv:
+        game_state.undo_move()
+    return pv
+
+
+'''
+Mate scores are stored relative to the node, not the root, so they stay
+correct when the position is reached at a different ply.
 '''
-Score the board based on the current material
 
-Positive is good for white, and negative is good for black
+
+def score_to_table(score, ply):
+    if score >= CHECKMATE - MAX_PLY:
+        return score + ply
+    if score <= -CHECKMATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= CHECKMATE - MAX_PLY:
+        return score - ply
+    if score <= -CHECKMATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+'''
+Score the board based on the current material and piece placement
+
+Positive is good for white, and negative is good for black. The totals are
+kept up to date by the bitboards, so this is O(1).
 '''
 
 
 def score_material(game_state):
-    score = 0
-    
     if game_state.checkmate:
         if game_state.white_to_move:
             return -CHECKMATE
@@ -125,80 +567,5 @@ def score_material(game_state):
             return CHECKMATE
     elif game_state.stalemate:
         return STALEMATE
-    
-    piece_square_table = {
-        "P": [
-            0, 0, 0, 0, 0, 0, 0, 0,
-            5, 5, 5, 5, 5, 5, 5, 5,
-            1, 1, 2, 3, 3, 2, 1, 1,
-            0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5,
-            0, 0, 0, 2, 2, 0, 0, 0,
-            0.5, -0.5, -1, 0, 0, -1, -0.5, 0.5,
-            0.5, 1, 1, -2, -2, 1, 1, 0.5,
-            0, 0, 0, 0, 0, 0, 0, 0
-        ],
-        "N": [
-            -5, -4, -3, -3, -3, -3, -4, -5,
-            -4, -2, 0, 0, 0, 0, -2, -4,
-            -3, 0, 1, 1.5, 1.5, 1, 0, -3,
-            -3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3,
-            -3, 0, 1.5, 2, 2, 1.5, 0, -3,
-            -3, 0.5, 1, 1.5, 1.5, 1, 0.5, -3,
-            -4, -2, 0, 0.5, 0.5, 0, -2, -4,
-            -5, -4, -3, -3, -3, -3, -4, -5
-        ],
-        "B": [
-            -2, -1, -1, -1, -1, -1, -1, -2,
-            -1, 0, 0, 0, 0, 0, 0, -1,
-            -1, 0, 0.5, 1, 1, 0.5, 0, -1,
-            -1, 0.5, 0.5, 1, 1, 0.5, 0.5, -1,
-            -1, 0, 1, 1, 1, 1, 0, -1,
-            -1, 1, 1, 1, 1, 1, 1, -1,
-            -1, 0.5, 0, 0, 0, 0, 0.5, -1,
-            -2, -1, -1, -1, -1, -1, -1, -2
-        ],
-        "R": [
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0.5, 1, 1, 1, 1, 1, 1, 0.5,
-            -0.5, 0, 0, 0, 0, 0, 0, -0.5,
-            -0.5, 0, 0, 0, 0, 0, 0, -0.5,
-            -0.5, 0, 0, 0, 0, 0, 0, -0.5,
-            -0.5, 0, 0, 0, 0, 0, 0, -0.5,
-            -0.5, 0, 0, 0, 0, 0, 0, -0.5,
-            0, 0, 0, 0.5, 0.5, 0, 0, 0
-        ],
-        "Q": [
-            -2, -1, -1, -0.5, -0.5, -1, -1, -2,
-            -1, 0, 0, 0, 0, 0, 0, -1,
-            -1, 0, 0.5, 0.5, 0.5, 0.5, 0, -1,
-            -0.5, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5,
-            0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5,
-            -1, 0.5, 0.5, 0.5, 0.5, 0.5, 0, -1,
-            -1, 0, 0.5, 0, 0, 0, 0, -1,
-            -2, -1, -1, -0.5, -0.5, -1, -1, -2
-        ],
-        "K": [
-            -3, -4, -4, -5, -5, -4, -4, -3,
-            -3, -4, -4, -5, -5, -4, -4, -3,
-            -3, -4, -4, -5, -5, -4, -4, -3,
-            -3, -4, -4, -5, -5, -4, -4, -3,
-            -2, -3, -3, -4, -4, -3, -3, -2,
-            -1, -2, -2, -2, -2, -2, -2, -1,
-            2, 2, 0, 0, 0, 0, 2, 2,
-            2, 3, 1, 0, 0, 1, 3, 2
-        ]
-    }
-
-    for row in range(len(game_state.board)):
-        for col in range(len(game_state.board[row])):
-            piece = game_state.board[row][col]
-            if piece != "--":
-                piece_type = piece[1]
-                piece_color = piece[0]
-                piece_value = piece_values[piece_type]
-                position_value = piece_square_table[piece_type][col * 8 + row]
-                if piece_color == "w":
-                    score += piece_value + position_value
-                elif piece_color == "b":
-                    score -= piece_value + position_value
-    return score
+
+    return evaluate(game_state.bitboards)
@@ -0,0 +1,158 @@
+'''
+Runs the AI in a background process so the game loop keeps rendering while
+the engine thinks.
+
+The game sends numbered requests through a queue and polls for the answer
+every frame. Cancelling a request makes its search stop at the next node
+check; answers to cancelled requests are thrown away. Between its own moves
+the AI can ponder: it searches the position after the reply it expects,
+which fills its transposition table for when the move comes.
+'''
+
+import atexit
+import ctypes
+import multiprocessing
+import pickle
+import queue
+from multiprocessing.sharedctypes import RawValue
+
+import ai
+
+SEARCH = 0
+PONDER = 1
+
+
+class AIWorker:
+    def __init__(self, time_limit=ai.TIME_LIMIT):
+        self.time_limit = time_limit
+        self.requests = multiprocessing.Queue()
+        self.responses = multiprocessing.Queue()
+        # Every request with an id up to this one is cancelled
+        self.cancelled = RawValue(ctypes.c_long, 0)
+        self.request_id = 0
+        self.pending = None  # Id of the search whose move is awaited
+        self.pending_key = None  # Zobrist key of the position it searches
+        self.pondering = False
+        # Not a daemon, so the parallel search can start its own workers
+        self.process = multiprocessing.Process(
+            target=run_worker, args=(self.requests, self.responses, self.cancelled))
+        self.process.start()
+        atexit.register(self.close)
+
+    def request_move(self, game_state, valid_moves):
+        """
+        Starts searching for a move in the given position, stopping any
+        search still running.
+        """
+        self.cancel()
+        self.pending = self.send(SEARCH, game_state, valid_moves, self.time_limit)
+        self.pending_key = game_state.zobrist_key
+
+    def ponder(self, game_state):
+        """
+        Thinks on the opponent's time until the next request or cancel.
+        """
+        self.cancel()
+        self.send(PONDER, game_state, None, None)
+        self.pondering = True
+
+    def poll(self, game_state, valid_moves):
+        """
+        Returns the move found for the pending request, or None while the
+        search is still running. An answer for another position than
+        game_state, or one that isn't among its valid_moves, is dropped
+        (None), so the next request searches the position again.
+        """
+        while self.pending is not None:
+            try:
+                request_id, move = self.responses.get_nowait()
+            except queue.Empty:
+                return None
+            if request_id == self.pending:
+                key = self.pending_key
+                self.pending = None
+                self.pending_key = None
+                if key != game_state.zobrist_key or move not in valid_moves:
+                    return None
+                return move
+        return None
+
+    def thinking(self):
+        return self.pending is not None
+
+    def cancel(self):
+        """
+        Stops the running search or ponder, if any.
+        """
+        if self.pending is not None or self.pondering:
+            self.cancelled.value = self.request_id
+            self.pending = None
+            self.pending_key = None
+            self.pondering = False
+
+    def send(self, kind, game_state, valid_moves, time_limit):
+        self.request_id += 1
+        # Pickled now, as the queue sends from a background thread while the
+        # game may already be changing the position
+        self.requests.put((self.request_id, kind, pickle.dumps(game_state), valid_moves, time_limit))
+        return self.request_id
+
+    def close(self):
+        if self.process.is_alive():
+            self.cancelled.value = self.request_id
+            self.requests.put(None)
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+class CancelFlag:
+    """
+    The stop flag of one request, set once it or a later one is cancelled.
+    """
+    __slots__ = ("cancelled", "request_id")
+
+    def __init__(self, cancelled, request_id):
+        self.cancelled = cancelled
+        self.request_id = request_id
+
+    @property
+    def value(self):
+        return self.cancelled.value >= self.request_id
+
+
+def run_worker(requests, responses, cancelled):
+    """
+    Main loop of the worker process: answers requests until it gets None.
+    """
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, kind, position, valid_moves, time_limit = request
+        stop_flag = CancelFlag(cancelled, request_id)
+        if stop_flag.value:
+            continue
+        game_state = pickle.loads(position)
+        if kind == SEARCH:
+            move = ai.get_best_move(game_state, valid_moves, time_limit, stop_flag=stop_flag)
+            if move is None and valid_moves:
+                move = ai.get_random_move(valid_moves)
+            responses.put((request_id, move))
+        else:
+            ponder(game_state, stop_flag)
+
+
+def ponder(game_state, stop_flag):
+    """
+    Searches the position after the opponent's expected reply (the hash
+    move) until stopped.
+    """
+    valid_moves = game_state.get_valid_moves()
+    table = ai.shared_table if ai.WORKERS > 1 else ai.transposition_table
+    entry = table.probe(game_state.zobrist_key) if table is not None else None
+    if entry is not None and entry[3] in valid_moves:
+        game_state.make_move(entry[3])
+        valid_moves = game_state.get_valid_moves()
+    if valid_moves:
+        ai.get_best_move(game_state, valid_moves, None, stop_flag=stop_flag, use_book=False)
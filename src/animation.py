@@ -0,0 +1,74 @@
+'''
+Time-based move animations, stepped by the game loop.
+
+A tween slides one piece between two squares over a fixed time, so a long
+move takes as long as a short one and the speed doesn't depend on the frame
+rate. Several tweens run at once, e.g. the king and the rook when castling.
+While they run, the squares they are heading for show what stood there
+before the move (overrides), so a captured piece stays visible until the
+moving piece arrives.
+'''
+
+import time
+
+ANIMATION_TIME = 0.15  # Seconds a move takes
+
+
+class Tween:
+    __slots__ = ("piece", "start", "end", "start_time", "duration")
+
+    def __init__(self, piece, start, end, start_time, duration=ANIMATION_TIME):
+        self.piece = piece  # Piece index, as in Bitboards.squares
+        self.start = start  # Squares, row * 8 + col
+        self.end = end
+        self.start_time = start_time
+        self.duration = duration
+
+    def position(self, now):
+        """
+        Returns the (row, col) the piece is at, between squares while it
+        moves. The piece slows down as it arrives.
+        """
+        progress = min(max((now - self.start_time) / self.duration, 0.0), 1.0)
+        progress = 1 - (1 - progress) ** 2
+        start_row, start_col = divmod(self.start, 8)
+        end_row, end_col = divmod(self.end, 8)
+        return (start_row + (end_row - start_row) * progress,
+                start_col + (end_col - start_col) * progress)
+
+    def finished(self, now):
+        return now - self.start_time >= self.duration
+
+
+class Animator:
+    def __init__(self):
+        self.tweens = []
+        self.overrides = {}  # Square -> piece shown there until the tweens end
+
+    def animate(self, moves, overrides, now=None):
+        """
+        Starts sliding pieces, given as (piece, start square, end square).
+        """
+        if now is None:
+            now = time.perf_counter()
+        self.tweens.extend(Tween(piece, start, end, now) for piece, start, end in moves)
+        self.overrides.update(overrides)
+
+    def update(self, now):
+        """
+        Drops the finished tweens. Returns the running ones.
+        """
+        self.tweens = [tween for tween in self.tweens if not tween.finished(now)]
+        if not self.tweens:
+            self.overrides = {}
+        return self.tweens
+
+    def active(self):
+        return bool(self.tweens)
+
+    def skip(self):
+        """
+        Ends every animation at once, with the pieces on their squares.
+        """
+        self.tweens = []
+        self.overrides = {}
@@ -0,0 +1,303 @@
+'''
+Self-play arena: plays games between two engine configurations to tell
+whether a change makes the engine stronger.
+
+    python src/arena.py --games 1000 --nodes 5000
+    python src/arena.py --games 200 --time 0.1 --b module=old/ai.py
+    python src/arena.py --a depth=4 --b depth=3 --sprt
+
+Every opening is played twice with the colors swapped, and the games run in
+parallel worker processes (one per core by default). Results stream in as
+games finish: wins/draws/losses for engine A, the Elo difference with its
+95% error bars, the SPRT log-likelihood ratio and each side's nodes/second.
+
+An engine is given as comma separated key=value settings:
+
+    module  path of the ai module to play with (default: this tree's ai.py)
+    time    seconds per move
+    nodes   nodes per move
+    depth   maximum depth per move
+    hash    transposition table size in MB
+
+and null_move, late_move_reductions, futility or razoring set to 0 or 1
+turns that part of the selective search off or on.
+'''
+
+import argparse
+import importlib.util
+import math
+import multiprocessing
+import os
+import time
+
+import ai
+from engine import GameState
+
+# Balanced openings as move sequences, each played once from either side
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5",
+    "e2e4 e7e5 g1f3 b8c6 f1c4",
+    "e2e4 e7e5 g1f3 g8f6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 c7c5 b1c3 b8c6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "e2e4 d7d6 d2d4 g8f6",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 d7d5 c2c4 c7c6",
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7",
+    "d2d4 f7f5 g2g3 g8f6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "c2c4 c7c5 g1f3 b8c6",
+    "g1f3 d7d5 g2g3 g8f6",
+]
+
+MAX_PLIES = 400  # Longer games are scored as draws
+
+
+'''
+Engine side of a game: an ai module with its own transposition table and
+search limits.
+'''
+
+
+class Player:
+    def __init__(self, settings):
+        self.module = load_ai(settings.get("module"))
+        self.table = self.module.TranspositionTable(int(settings.get("hash", ai.HASH_SIZE_MB)))
+        self.time_limit = float(settings["time"]) if "time" in settings else None
+        self.node_limit = int(settings["nodes"]) if "nodes" in settings else None
+        self.max_depth = int(settings.get("depth", ai.MAX_DEPTH))
+        self.pruning = {name: settings[name] != "0" for name in ai.PRUNING_OPTIONS if name in settings}
+
+    def new_game(self):
+        self.table.clear()
+
+    def choose_move(self, game_state, valid_moves):
+        """
+        Returns (move, nodes searched).
+        """
+        self.table.new_search()
+        search = self.module.Search(game_state, self.table, self.time_limit, self.node_limit)
+        for name, enabled in self.pruning.items():
+            setattr(search, name, enabled)
+        return search.iterative_deepening(valid_moves, self.max_depth), search.nodes
+
+
+def load_ai(path):
+    """
+    Imports an ai module from a file, or returns this tree's ai module.
+    """
+    if not path:
+        return ai
+    name = "arena_ai_" + os.path.splitext(os.path.basename(path))[0] + str(abs(hash(path)))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_settings(text, defaults):
+    settings = dict(defaults)
+    for item in filter(None, text.split(",")):
+        key, value = item.split("=", 1)
+        settings[key.strip()] = value.strip()
+    return settings
+
+
+def opening_position(opening):
+    """
+    Builds the start of a game from a FEN or a move sequence.
+    """
+    if "/" in opening:
+        return GameState.from_fen(opening)
+    game_state = GameState()
+    for text in opening.split():
+        game_state.make_move(game_state.parse_move(text))
+    return game_state
+
+
+'''
+Worker processes set the players up once and then play games on request.
+'''
+
+players = None
+
+
+def init_worker(settings_a, settings_b):
+    global players
+    players = (Player(settings_a), Player(settings_b))
+
+
+def play_game(task):
+    """
+    Plays one game and returns (game number, score of engine A, reason,
+    plies, nodes and seconds for A, nodes and seconds for B).
+    """
+    number, opening, a_is_white = task
+    game_state = opening_position(opening)
+    player_a, player_b = players
+    player_a.new_game()
+    player_b.new_game()
+    white, black = (player_a, player_b) if a_is_white else (player_b, player_a)
+    nodes = {player_a: 0, player_b: 0}
+    seconds = {player_a: 0.0, player_b: 0.0}
+
+    result = 0.5
+    for _ in range(MAX_PLIES):
+        valid_moves = game_state.get_valid_moves()
+        if not valid_moves:
+            if game_state.checkmate:
+                result, reason = (0.0 if game_state.white_to_move else 1.0), "checkmate"
+            else:
+                reason = "stalemate"
+            break
+        reason = game_state.draw_reason()
+        if reason is not None:
+            break
+        player = white if game_state.white_to_move else black
+        start = time.perf_counter()
+        move, searched = player.choose_move(game_state, valid_moves)
+        seconds[player] += time.perf_counter() - start
+        nodes[player] += searched
+
+        game_state.make_move(move)
+    else:
+        reason = "move limit"
+
+    score = result if a_is_white else 1.0 - result
+    return (number, score, reason, len(game_state.move_log), nodes[player_a], seconds[player_a],
+            nodes[player_b], seconds[player_b])
+
+
+'''
+Statistics on the results of engine A.
+'''
+
+
+def elo_difference(wins, draws, losses):
+    """
+    Returns (Elo difference, 95% error margin) from the game results.
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return score_to_elo(score), (score_to_elo(score + margin) - score_to_elo(score - margin)) / 2
+
+
+def score_to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    Returns the log-likelihood ratio of elo1 against elo0 with the normal
+    approximation of the game results.
+    """
+    games = wins + draws + losses
+    if games == 0 or wins == games or losses == games:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def summary(wins, draws, losses, nodes, seconds, llr, bounds):
+    games = wins + draws + losses
+    elo, margin = elo_difference(wins, draws, losses)
+    nps_a = nodes[0] / seconds[0] if seconds[0] else 0
+    nps_b = nodes[1] / seconds[1] if seconds[1] else 0
+    return (f"games {games}  W {wins} D {draws} L {losses}  elo {elo:+.1f} +/- {margin:.1f}  "
+            f"llr {llr:.2f} [{bounds[0]:.2f}, {bounds[1]:.2f}]  "
+            f"nps A {nps_a:,.0f} B {nps_b:,.0f}")
+
+
+def run_match(settings_a, settings_b, games, workers, openings, elo0=0, elo1=5, alpha=0.05, beta=0.05,
+              sprt=False, verbose=False):
+    """
+    Plays the match and prints a summary after every game. Returns
+    (wins, draws, losses) of engine A.
+    """
+    tasks = [(number, openings[number // 2 % len(openings)], number % 2 == 0) for number in range(games)]
+    wins = draws = losses = 0
+    nodes = [0, 0]
+    seconds = [0.0, 0.0]
+    bounds = sprt_bounds(alpha, beta)
+    with multiprocessing.Pool(workers, init_worker, (settings_a, settings_b)) as pool:
+        for number, score, reason, plies, nodes_a, seconds_a, nodes_b, seconds_b in \
+                pool.imap_unordered(play_game, tasks):
+            if score == 1:
+                wins += 1
+            elif score == 0:
+                losses += 1
+            else:
+                draws += 1
+            nodes[0] += nodes_a
+            nodes[1] += nodes_b
+            seconds[0] += seconds_a
+            seconds[1] += seconds_b
+            llr = sprt_llr(wins, draws, losses, elo0, elo1)
+            if verbose:
+                print(f"game {number + 1}: {score} by {reason} after {plies} plies")
+            print(summary(wins, draws, losses, nodes, seconds, llr, bounds), flush=True)
+            if sprt and not bounds[0] < llr < bounds[1]:
+                print(f"SPRT: {'H1' if llr >= bounds[1] else 'H0'} accepted "
+                      f"(elo {elo1 if llr >= bounds[1] else elo0} more likely)")
+                pool.terminate()
+                break
+    return wins, draws, losses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine A against engine B.")
+    parser.add_argument("--a", default="", help="Settings of engine A, e.g. 'depth=4' or 'module=ai.py'")
+    parser.add_argument("--b", default="", help="Settings of engine B")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Games played at once")
+    parser.add_argument("--time", type=float, help="Seconds per move for both engines")
+    parser.add_argument("--nodes", type=int, help="Nodes per move for both engines")
+    parser.add_argument("--depth", type=int, help="Maximum depth for both engines")
+    parser.add_argument("--openings", help="File with one FEN or move sequence per line")
+    parser.add_argument("--sprt", action="store_true", help="Stop once the SPRT decides")
+    parser.add_argument("--elo0", type=float, default=0)
+    parser.add_argument("--elo1", type=float, default=5)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--verbose", action="store_true", help="Print every game result")
+    args = parser.parse_args()
+
+    defaults = {}
+    if args.time is not None:
+        defaults["time"] = args.time
+    if args.nodes is not None:
+        defaults["nodes"] = args.nodes
+    if args.depth is not None:
+        defaults["depth"] = args.depth
+    if not defaults:
+        defaults["nodes"] = 5000
+    openings = OPENINGS
+    if args.openings:
+        with open(args.openings) as file:
+            openings = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+    run_match(parse_settings(args.a, defaults), parse_settings(args.b, defaults), args.games,
+              args.workers, openings, args.elo0, args.elo1, args.alpha, args.beta, args.sprt,
+              args.verbose)
+
+
+if __name__ == "__main__":
+    main()
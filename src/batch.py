@@ -0,0 +1,90 @@
+'''
+Vectorized evaluation of many positions at once with NumPy, for bulk
+analysis jobs such as scoring every position of a game collection.
+
+Positions are packed into a (K, 64) array of piece indices (EMPTY for an
+empty square), laid out like Bitboards.squares, or into (K, 12, 64) piece
+planes. Either is scored in one go against the same folded material and
+piece-square weights the incremental evaluation uses, so the scores match
+evaluation.evaluate exactly.
+
+The search keeps its evaluation as running totals updated on every move,
+which a batch can't beat for a single leaf; this is for scoring positions
+that don't come out of one search.
+'''
+
+import numpy as np
+
+from bitboard import EMPTY
+from evaluation import MIDGAME_SCORES, ENDGAME_SCORES, PHASE_WEIGHTS, MAX_PHASE
+
+# [piece][square] midgame, endgame and phase weights, with a zero row for
+# empty squares
+WEIGHTS = np.stack([np.array(MIDGAME_SCORES + [[0] * 64]),
+                    np.array(ENDGAME_SCORES + [[0] * 64]),
+                    np.array([[weight] * 64 for weight in PHASE_WEIGHTS + [0]])], axis=-1)
+PLANE_WEIGHTS = WEIGHTS[:EMPTY].reshape(12 * 64, 3).astype(np.float32)
+
+# The three weights of a square packed in one integer, 21 bits each, so a
+# position takes a single sum. Midgame and endgame weights are offset to
+# keep the fields positive: 64 squares of at most 2 * BIAS fit in 21 bits.
+BIAS = 1024
+FIELD_BITS = 21
+FIELD_MASK = (1 << FIELD_BITS) - 1
+PACKED_WEIGHTS = ((WEIGHTS[..., 0] + BIAS) | (WEIGHTS[..., 1] + BIAS) << FIELD_BITS |
+                  WEIGHTS[..., 2] << 2 * FIELD_BITS).astype(np.int64).ravel()
+SQUARES = np.arange(64, dtype=np.int32)
+CHUNK_SIZE = 4096  # Positions scored at once
+
+
+def pack_squares(positions):
+    """
+    Packs game states or bitboards into a (K, 64) array of piece indices.
+    """
+    return np.array([getattr(position, "bitboards", position).squares for position in positions],
+                    dtype=np.uint8)
+
+
+def pack_planes(positions):
+    """
+    Packs game states or bitboards into (K, 12, 64) piece planes: plane p
+    is 1 on the squares holding piece p.
+    """
+    squares = pack_squares(positions)
+    return (squares[:, None, :] == np.arange(12, dtype=np.uint8)[None, :, None]).astype(np.uint8)
+
+
+def evaluate_batch(positions):
+    """
+    Returns the tapered scores, from white's side, of packed positions: a
+    (K, 64) array of piece indices or (K, 12, 64) piece planes.
+    """
+    positions = np.asarray(positions)
+    scores = np.empty(len(positions), dtype=np.int64)
+    # In chunks, so the temporaries stay small enough for the cache
+    for start in range(0, len(positions), CHUNK_SIZE):
+        chunk = positions[start:start + CHUNK_SIZE]
+        if chunk.ndim == 3:
+            midgame, endgame, phase = plane_totals(chunk)
+        else:
+            midgame, endgame, phase = square_totals(chunk)
+        phase = np.minimum(phase, MAX_PHASE)
+        scores[start:start + CHUNK_SIZE] = (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+    return scores
+
+
+def square_totals(squares):
+    index = squares.astype(np.int32)
+    index *= 64
+    index += SQUARES
+    totals = np.take(PACKED_WEIGHTS, index).sum(axis=1)
+    return ((totals & FIELD_MASK) - 64 * BIAS, (totals >> FIELD_BITS & FIELD_MASK) - 64 * BIAS,
+            totals >> 2 * FIELD_BITS)
+
+
+def plane_totals(planes):
+    # One dot product of the flattened planes with the weights; float32 is
+    # exact for these sums and far faster than an integer product
+    totals = planes.reshape(len(planes), 12 * 64).astype(np.float32) @ PLANE_WEIGHTS
+    totals = np.rint(totals).astype(np.int64)
+    return totals[:, 0], totals[:, 1], totals[:, 2]
@@ -0,0 +1,338 @@
+'''
+Bitboard representation of a chess position.
+
+Squares are numbered row * 8 + col, using the same (row, col) layout as the
+renderer: square 0 is a8 and square 63 is h1. Bit n of a bitboard is set when
+square n is occupied.
+'''
+
+from zobrist import PIECE_KEYS
+from evaluation import MIDGAME_SCORES, ENDGAME_SCORES, PHASE_WEIGHTS
+
+WHITE = 0
+BLACK = 1
+
+# Piece types
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# Pieces are indexed color * 6 + piece_type
+WP, WN, WB, WR, WQ, WK, BP, BN, BB, BR, BQ, BK = range(12)
+EMPTY = 12
+
+PIECE_NAMES = ["wP", "wN", "wB", "wR", "wQ", "wK",
+               "bP", "bN", "bB", "bR", "bQ", "bK", "--"]
+PIECE_INDEX = {name: index for index, name in enumerate(PIECE_NAMES)}
+PIECE_TYPES = "PNBRQK"
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+# Row 0 (rank 8) for white pawns, row 7 (rank 1) for black pawns
+PROMOTION_RANKS = [0xFF, 0xFF << 56]
+
+
+def square(row, col):
+    """
+    Converts a (row, col) pair to a square index.
+    """
+    return row * 8 + col
+
+
+def iter_bits(bitboard):
+    """
+    Yields the index of every set bit, lowest first.
+    """
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+def _step_targets(deltas):
+    """
+    Builds a per-square bitboard of the squares reached by single steps.
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        targets = 0
+        for d_row, d_col in deltas:
+            end_row = row + d_row
+            end_col = col + d_col
+            if 0 <= end_row < 8 and 0 <= end_col < 8:
+                targets |= 1 << (end_row * 8 + end_col)
+        table.append(targets)
+    return table
+
+
+KNIGHT_ATTACKS = _step_targets(((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                (1, -2), (1, 2), (2, -1), (2, 1)))
+KING_ATTACKS = _step_targets(((-1, -1), (-1, 0), (-1, 1), (0, -1),
+                              (0, 1), (1, -1), (1, 0), (1, 1)))
+# Squares attacked by a pawn of the given color standing on a square
+PAWN_ATTACKS = [_step_targets(((-1, -1), (-1, 1))),
+                _step_targets(((1, -1), (1, 1)))]
+
+# Sliding directions. Rays in the "positive" directions run towards higher
+# square indices, so their first blocker is the lowest set bit; the others
+# find it with the highest set bit.
+NORTH, SOUTH, WEST, EAST, NORTH_WEST, NORTH_EAST, SOUTH_WEST, SOUTH_EAST = range(8)
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1),
+              (-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def _rays():
+    """
+    Builds RAYS[direction][square], every square from (but excluding)
+    square to the edge of the board.
+    """
+    rays = []
+    for d_row, d_col in DIRECTIONS:
+        table = []
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            ray = 0
+            row += d_row
+            col += d_col
+            while 0 <= row < 8 and 0 <= col < 8:
+                ray |= 1 << (row * 8 + col)
+                row += d_row
+                col += d_col
+            table.append(ray)
+        rays.append(table)
+    return rays
+
+
+RAYS = _rays()
+(_N, _S, _W, _E, _NW, _NE, _SW, _SE) = RAYS
+
+
+def _between():
+    """
+    Builds BETWEEN[a][b], the squares strictly between two squares on a
+    shared rank, file or diagonal (0 when they are not aligned).
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for rays in RAYS:
+        for a in range(64):
+            for b in iter_bits(rays[a]):
+                table[a][b] = rays[a] & ~rays[b] & ~(1 << b)
+    return table
+
+
+BETWEEN = _between()
+
+
+def rook_attacks(sq, occupied):
+    """
+    Returns the squares a rook on sq attacks given the occupancy.
+    """
+    attacks = 0
+    ray = _S[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _S[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = _E[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _E[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = _N[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _N[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = _W[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _W[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def bishop_attacks(sq, occupied):
+    """
+    Returns the squares a bishop on sq attacks given the occupancy.
+    """
+    attacks = 0
+    ray = _SW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _SW[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = _SE[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _SE[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = _NW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _NW[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = _NE[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _NE[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+class Bitboards:
+    """
+    Holds one bitboard per piece and color, the occupancy masks and a
+    64-entry mailbox for constant time piece lookups by square.
+
+    key is the Zobrist hash of the piece placement, and midgame, endgame and
+    phase the material + piece-square totals; all are updated on every change.
+    """
+
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.colors = [0, 0]
+        self.occupied = 0
+        self.squares = [EMPTY] * 64
+        self.key = 0
+        self.midgame = 0
+        self.endgame = 0
+        self.phase = 0
+        self.view = BoardView(self.squares)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds the bitboards from an 8x8 grid of piece names ("wP", "--", ...).
+        """
+        bitboards = cls()
+        for row in range(8):
+            for col in range(8):
+                piece = PIECE_INDEX[rows[row][col]]
+                if piece != EMPTY:
+                    bitboards.put(piece, row * 8 + col)
+        return bitboards
+
+    def put(self, piece, sq):
+        """
+        Places a piece on an empty square.
+        """
+        mask = 1 << sq
+        self.pieces[piece] |= mask
+        self.colors[piece // 6] |= mask
+        self.occupied |= mask
+        self.squares[sq] = piece
+        self.key ^= PIECE_KEYS[piece][sq]
+        self.midgame += MIDGAME_SCORES[piece][sq]
+        self.endgame += ENDGAME_SCORES[piece][sq]
+        self.phase += PHASE_WEIGHTS[piece]
+
+    def remove(self, sq):
+        """
+        Clears a square and returns the piece that was on it.
+        """
+        piece = self.squares[sq]
+        if piece != EMPTY:
+            mask = ~(1 << sq)
+            self.pieces[piece] &= mask
+            self.colors[piece // 6] &= mask
+            self.occupied &= mask
+            self.squares[sq] = EMPTY
+            self.key ^= PIECE_KEYS[piece][sq]
+            self.midgame -= MIDGAME_SCORES[piece][sq]
+            self.endgame -= ENDGAME_SCORES[piece][sq]
+            self.phase -= PHASE_WEIGHTS[piece]
+        return piece
+
+    def move(self, from_sq, to_sq):
+        """
+        Moves the piece on from_sq to the empty square to_sq.
+        """
+        piece = self.squares[from_sq]
+        mask = (1 << from_sq) | (1 << to_sq)
+        self.pieces[piece] ^= mask
+        self.colors[piece // 6] ^= mask
+        self.occupied ^= mask
+        self.squares[from_sq] = EMPTY
+        self.squares[to_sq] = piece
+        keys = PIECE_KEYS[piece]
+        self.key ^= keys[from_sq] ^ keys[to_sq]
+        scores = MIDGAME_SCORES[piece]
+        self.midgame += scores[to_sq] - scores[from_sq]
+        scores = ENDGAME_SCORES[piece]
+        self.endgame += scores[to_sq] - scores[from_sq]
+
+    def king_square(self, color):
+        """
+        Returns the square of the king of the given color.
+        """
+        return self.pieces[color * 6 + KING].bit_length() - 1
+
+    def attackers(self, sq, color, occupied):
+        """
+        Returns the pieces of the given color attacking sq.
+        """
+        pieces = self.pieces
+        base = color * 6
+        queens = pieces[base + QUEEN]
+        return ((PAWN_ATTACKS[color ^ 1][sq] & pieces[base + PAWN]) |
+                (KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]) |
+                (KING_ATTACKS[sq] & pieces[base + KING]) |
+                (rook_attacks(sq, occupied) & (pieces[base + ROOK] | queens)) |
+                (bishop_attacks(sq, occupied) & (pieces[base + BISHOP] | queens)))
+
+    def attack_map(self, color, occupied):
+        """
+        Returns every square attacked by the given color.
+        """
+        pieces = self.pieces
+        base = color * 6
+        pawns = pieces[base + PAWN]
+        if color == WHITE:
+            attacks = ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+        else:
+            attacks = (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL
+        for sq in iter_bits(pieces[base + KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        queens = pieces[base + QUEEN]
+        for sq in iter_bits(pieces[base + BISHOP] | queens):
+            attacks |= bishop_attacks(sq, occupied)
+        for sq in iter_bits(pieces[base + ROOK] | queens):
+            attacks |= rook_attacks(sq, occupied)
+        return attacks | KING_ATTACKS[self.king_square(color)]
+
+
+class BoardView:
+    """
+    Read-only board[row][col] view of the mailbox returning piece names,
+    so code written against the old string board keeps working.
+    """
+    __slots__ = ("squares",)
+
+    def __init__(self, squares):
+        self.squares = squares
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, row):
+        return _RowView(self.squares, row * 8)
+
+    def __iter__(self):
+        for row in range(8):
+            yield _RowView(self.squares, row * 8)
+
+
+class _RowView:
+    __slots__ = ("squares", "offset")
+
+    def __init__(self, squares, offset):
+        self.squares = squares
+        self.offset = offset
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, col):
+        return PIECE_NAMES[self.squares[self.offset + col]]
+
+    def __iter__(self):
+        for col in range(8):
+            yield PIECE_NAMES[self.squares[self.offset + col]]
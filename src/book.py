@@ -0,0 +1,231 @@
+'''
+Opening book in the Polyglot format, and a tool to build one from games.
+
+A book is a file of 16 byte records sorted by position key, all big-endian:
+
+    key (8 bytes)     Polyglot key of the position, see polyglot.py
+    move (2 bytes)    to file, to rank, from file, from rank in 3 bits each,
+                      then the promotion piece (0 none, 1 knight ... 4 queen)
+    weight (2 bytes)  how often the move should be chosen
+    learn (4 bytes)   unused
+
+The file is memory mapped and searched with a binary search on the key, so
+opening a book costs nothing however large it is, and only the pages read
+by a lookup are ever loaded.
+
+    python src/book.py build games.pgn book.bin --plies 24 --min-games 3
+    python src/book.py probe book.bin --fen "<fen>"
+'''
+
+import argparse
+import mmap
+import random
+import re
+import struct
+from collections import defaultdict
+
+from engine import GameState
+from move import KING_CASTLE, QUEEN_CASTLE, PROMOTION, notation
+from polyglot import polyglot_key
+
+ENTRY = struct.Struct(">QHHI")
+
+
+def polyglot_move(move):
+    """
+    Encodes a packed move as a Polyglot book move. Castling is written as
+    the king taking its own rook.
+    """
+    start = move & 63
+    end = move >> 6 & 63
+    flags = move >> 12
+    if flags == KING_CASTLE:
+        end += 1
+    elif flags == QUEEN_CASTLE:
+        end -= 2
+    promotion = (flags & 3) + 1 if flags & PROMOTION else 0
+    return (end % 8 | (7 - end // 8) << 3 | (start % 8) << 6 | (7 - start // 8) << 9 |
+            promotion << 12)
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        # An empty file can't be mapped, and holds no moves anyway
+        self.book = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if \
+            self.file.seek(0, 2) else b""
+        self.size = len(self.book) // ENTRY.size
+
+    def close(self):
+        if isinstance(self.book, mmap.mmap):
+            self.book.close()
+        self.file.close()
+
+    def first_entry(self, key):
+        """
+        Returns the index of the first record with a key of at least key.
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.book, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        """
+        Returns (Polyglot move, weight) for every record of the key.
+        """
+        entries = []
+        index = self.first_entry(key)
+        while index < self.size:
+            entry_key, move, weight, _ = ENTRY.unpack_from(self.book, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+            index += 1
+        return entries
+
+    def moves(self, game_state, valid_moves):
+        """
+        Returns (move, weight) for the book moves of the position that are
+        legal in it.
+        """
+        entries = self.entries(polyglot_key(game_state))
+        if not entries:
+            return []
+        legal = {polyglot_move(move): move for move in valid_moves}
+        return [(legal[move], weight) for move, weight in entries if move in legal]
+
+    def choose(self, game_state, valid_moves, rng=random):
+        """
+        Returns a book move picked at random in proportion to the weights,
+        or None when the position is not in the book.
+        """
+        moves = [(move, weight) for move, weight in self.moves(game_state, valid_moves) if weight]
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+
+'''
+Building a book from a PGN collection
+
+Every position of the first plies of every game gets the move played in it.
+A move is weighted by its results for the side that played it: 2 for a win,
+1 for a draw and 0 for a loss, so moves that only ever lost stay in the book
+but are never chosen.
+'''
+
+TAG = re.compile(r"\[\s*(\w+)\s+\"([^\"]*)\"\s*\]")
+COMMENT = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+")
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+RESULTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}
+
+
+def read_games(path):
+    """
+    Yields (result, list of SAN moves) for every game of a PGN file.
+    """
+    with open(path, encoding="utf-8", errors="replace") as file:
+        text = file.read()
+    tags = {}
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("["):
+            tags = dict(TAG.findall(block))
+            # The moves may follow the tags without a blank line
+            block = TAG.sub(" ", block).strip()
+            if not block:
+                continue
+        yield tags.get("Result", "*"), parse_movetext(block)
+        tags = {}
+
+
+def parse_movetext(text):
+    text = COMMENT.sub(" ", text)
+    # Drop variations, which may be nested
+    while "(" in text:
+        stripped = re.sub(r"\([^()]*\)", " ", text)
+        if stripped == text:
+            break
+        text = stripped
+    moves = []
+    for token in text.split():
+        token = MOVE_NUMBER.sub("", token)
+        if token and token not in RESULTS and token != "*":
+            moves.append(token)
+    return moves
+
+
+def build_book(pgn_paths, output, max_plies=24, min_games=1):
+    """
+    Writes a book of the positions of the first max_plies plies of every
+    game, keeping moves played in at least min_games games. Returns the
+    number of records written.
+    """
+    # key -> Polyglot move -> [games, weight]
+    positions = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    for path in pgn_paths:
+        for result, moves in read_games(path):
+            points = RESULTS.get(result)
+            if points is None:
+                continue
+            game_state = GameState()
+            for text in moves[:max_plies]:
+                move = game_state.parse_san(text)
+                if move is None:
+                    break
+                stats = positions[polyglot_key(game_state)][polyglot_move(move)]
+                stats[0] += 1
+                stats[1] += points[0 if game_state.white_to_move else 1]
+                game_state.make_move(move)
+
+    records = []
+    for key, moves in positions.items():
+        moves = [(move, games, weight) for move, (games, weight) in moves.items() if games >= min_games]
+        if not moves:
+            continue
+        # Weights must fit in 16 bits
+        scale = max(max(weight for _, _, weight in moves) / 0xFFFF, 1)
+        for move, _, weight in sorted(moves, key=lambda entry: -entry[2]):
+            records.append((key, move, int(weight / scale), 0))
+    records.sort(key=lambda record: record[0])
+    with open(output, "wb") as file:
+        for record in records:
+            file.write(ENTRY.pack(*record))
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or probe a Polyglot opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build a book from PGN files")
+    build.add_argument("pgn", nargs="+", help="PGN files to read")
+    build.add_argument("output", help="Book file to write")
+    build.add_argument("--plies", type=int, default=24, help="Plies of every game to add")
+    build.add_argument("--min-games", type=int, default=1, help="Games a move must be played in")
+    probe = commands.add_parser("probe", help="List the book moves of a position")
+    probe.add_argument("book", help="Book file to read")
+    probe.add_argument("--fen", help="Position to look up (default: the start position)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        records = build_book(args.pgn, args.output, args.plies, args.min_games)
+        print(f"wrote {records} moves to {args.output}")
+    else:
+        game_state = GameState.from_fen(args.fen) if args.fen else GameState()
+        book = OpeningBook(args.book)
+        moves = book.moves(game_state, game_state.get_valid_moves())
+        total = sum(weight for _, weight in moves) or 1
+        for move, weight in moves:
+            print(f"{notation(move):<6} {game_state.san(move):<8} weight {weight:<6} {weight * 100 / total:.1f}%")
+        book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,27 @@
 Main driver file. Responsible for handling user input and displaying the current GameState object.
 '''
 
+import time
 import pygame as pg
 from keymanager import KeyManager
 import engine
-import ai
+from aiworker import AIWorker
+from animation import Animator
+from bitboard import PIECE_NAMES, EMPTY, PAWN
+from move import notation, start_square, end_square, move_flags, PROMOTION, EN_PASSANT, KING_CASTLE, QUEEN_CASTLE
 
 # Constants for the window and chessboard
 WIDTH = HEIGHT = 512
 DIMENSION = 8  # Dimension of the chess board (8x8)
 SQ_SIZE = HEIGHT // DIMENSION
-MAX_FPS = 144  # For animations
+MAX_FPS = 144  # While animating
+IDLE_FPS = 30  # While nothing on screen changes
+BOARD_COLORS = [pg.Color(255, 206, 158), pg.Color(209, 139, 71)]
+HIGHLIGHT_COLOR = pg.Color(255, 255, 100, 100)  # Hover, selection and move targets
+LAST_MOVE_COLOR = pg.Color(255, 0, 0, 100)
+DRAW_TEXTS = {"repetition": "Draw by repetition", "fifty moves": "Draw by the fifty-move rule",
+              "insufficient material": "Draw by insufficient material"}
+PONDER = False  # Let the AI think on the player's time as well
 IMAGES = {}
 
 
@@ -25,10 +36,20 @@ class Chess():
         self.game_state = engine.GameState()
         self.load_images()  # Load the images
         self.key_manager = KeyManager()
+        self.ai_worker = None  # Background process the AI thinks in, started by run()
+        self.board_surface = self.render_board()  # The empty board, drawn once
+        # What each square shows on screen, so only changed squares are redrawn
+        self.square_states = [None] * (DIMENSION * DIMENSION)
+        self.text = None  # Message shown over the board
+        self.font = pg.font.SysFont("Arial", 32, True, False)
+        self.animator = Animator()
+        self.sprite_rects = []  # Where the animated pieces were drawn last frame
 
     def run(self):
         pg.display.set_caption("Square Logic")
+        self.ai_worker = AIWorker()
         valid_moves = self.game_state.get_valid_moves()
+        move_index = self.game_state.get_move_index(valid_moves)  # Legal moves by square
         move_made = False  # Flag that checks weather the user has made a move
         animate = False  # Flag that checks weather the user has made a move
         promotion_type = "Q"
@@ -45,9 +66,12 @@ class Chess():
 
             self.key_manager.handle_events()
 
+            if self.key_manager.exposed:
+                self.invalidate()  # The window was covered, draw it all again
             if self.key_manager.quit:
                 self.running = False
             elif self.key_manager.mouse_button_down:
+                self.animator.skip()  # A click finishes a running animation at once
                 if not game_over and human_turn:
                     # (x, y) position of the mouse
                     mouse_pos = self.key_manager.mouse_pos
@@ -62,29 +86,23 @@ class Chess():
                         player_clicks.append(sq_selected)
 
                     if len(player_clicks) == 2:  # After two clicks, make a move
-                        move = engine.Move(
-                            player_clicks[0], player_clicks[1], self.game_state.board)
-                        print(move.get_chess_notation())
-                        for i in range(len(valid_moves)):
-                            '''
-                            This allows us to use the move generated by the engine thus they can be more complex,
-                            In the sense of the information about the move.Also keep the player moves simple and 
-                            isolated.
-                            '''
-                            if move == valid_moves[i]:
-                                if move.is_pawn_promotion:
-                                    self.game_state.make_move(
-                                        valid_moves[i], promotion_type)
-                                else:
-                                    self.game_state.make_move(valid_moves[i])
-                                move_made = True
-                                animate = True
-                                sq_selected = ()  # Reset user selection
-                                player_clicks = []
-                        if not move_made:
+                        (start_row, start_col), (end_row, end_col) = player_clicks
+                        # The engine's own move, so it carries everything the engine knows about it
+                        move = move_index.find(start_row * DIMENSION + start_col, end_row * DIMENSION + end_col,
+                                               promotion_type)
+                        if move is not None:
+                            print(notation(move))
+                            self.game_state.make_move(move)
+                            move_made = True
+                            animate = True
+                            sq_selected = ()  # Reset user selection
+                            player_clicks = []
+                        else:
                             player_clicks = [sq_selected]
             # Handles the keys.
             elif self.key_manager.backspace_pressed:
+                self.ai_worker.cancel()
+                self.animator.skip()
                 if human_turn:
                     self.game_state.undo_move()
                 self.game_state.undo_move()
@@ -92,44 +110,60 @@ class Chess():
                 animate = False
                 game_over = False
             elif self.key_manager.reset_pressed:
+                self.ai_worker.cancel()
+                self.animator.skip()
                 self.game_state = engine.GameState()
                 valid_moves = self.game_state.get_valid_moves()
+                move_index = self.game_state.get_move_index(valid_moves)
                 sq_selected = ()
                 player_clicks = []
                 move_made = False
                 animate = False
                 game_over = False
+                human_turn = (self.game_state.white_to_move and player_one) or (
+                    not self.game_state.white_to_move and player_two)
 
-            # AI move
-            if not game_over and not human_turn:
-                AIMove = ai.get_best_move(self.game_state, valid_moves)
-                if AIMove is None:
-                    AIMove = ai.get_random_move(valid_moves)
-                self.game_state.make_move(AIMove)
-                move_made = True
-                animate = True
+            # AI move, searched in the background and picked up once it is found
+            if not game_over and not human_turn and not move_made:
+                if not self.ai_worker.thinking():
+                    self.ai_worker.request_move(self.game_state, valid_moves)
+                AIMove = self.ai_worker.poll(self.game_state, valid_moves)
+                if AIMove is not None:
+                    self.game_state.make_move(AIMove)
+                    move_made = True
+                    animate = True
 
             if move_made:
                 if animate:
-                    self.animate_move(
-                        self.game_state.move_log[-1])
+                    self.animate_move(self.game_state.move_log[-1])
                 valid_moves = self.game_state.get_valid_moves()
+                move_index = self.game_state.get_move_index(valid_moves)
                 move_made = False
+                human_turn = (self.game_state.white_to_move and player_one) or (
+                    not self.game_state.white_to_move and player_two)
+                if PONDER and human_turn and valid_moves:
+                    self.ai_worker.ponder(self.game_state)
 
+            text = None
             if self.game_state.checkmate:
                 game_over = True
                 if self.game_state.white_to_move:
-                    self.draw_text("Black wins by checkmate")
+                    text = "Black wins by checkmate"
                 else:
-                    self.draw_text("White wins by checkmate")
+                    text = "White wins by checkmate"
             elif self.game_state.stalemate:
                 game_over = True
-                self.draw_text("Stalemate")
+                text = "Stalemate"
+            else:
+                draw = self.game_state.draw_reason()
+                if draw is not None:
+                    game_over = True
+                    text = DRAW_TEXTS[draw]
 
-            self.draw_game_state(sq_selected, valid_moves, self.game_state.move_log[-1] if len(
-                self.game_state.move_log) != 0 else None)
-            self.clock.tick(MAX_FPS)
-            pg.display.flip()
+            changed = self.draw_game_state(sq_selected, move_index, self.game_state.move_log[-1] if len(
+                self.game_state.move_log) != 0 else None, text)
+            self.clock.tick(MAX_FPS if changed or self.animator.active() else IDLE_FPS)
+        self.ai_worker.close()
         pg.quit()
 
     def load_images(self):
@@ -141,77 +175,109 @@ class Chess():
                               ".png"), (SQ_SIZE, SQ_SIZE)
             )
 
-    # Responsible for rendering the game state
-    def draw_game_state(self,  sq_selected, valid_moves, last_move=None):
-        self.draw_board()  # Draw the squares
-        self.highlight_squares(valid_moves, sq_selected)
-        self.last_move_made(last_move)
-        # Draw the pieces on top of the squares
-        self.draw_pieces()
+    # Responsible for rendering the game state. Only the squares that look
+    # different from the last frame are redrawn and sent to the display.
+    # Returns True when anything was redrawn.
+    def draw_game_state(self, sq_selected, move_index, last_move=None, text=None):
+        now = time.perf_counter()
+        sprites = []  # Animated pieces and where they are drawn
+        for tween in self.animator.update(now):
+            row, col = tween.position(now)
+            sprites.append((tween.piece, pg.Rect(round(col * SQ_SIZE), round(row * SQ_SIZE), SQ_SIZE, SQ_SIZE)))
+        states = self.get_square_states(sq_selected, move_index, last_move)
+        # Squares the animated pieces covered last frame or cover now are redrawn
+        for rect in self.sprite_rects + [rect for _, rect in sprites]:
+            for sq in self.get_squares_under(rect):
+                self.square_states[sq] = None
+        dirty = []
+        for sq, state in enumerate(states):
+            if state != self.square_states[sq]:
+                dirty.append(self.draw_square(sq, state))
+        self.square_states = states
+        for piece, rect in sprites:
+            self.screen.blit(IMAGES[PIECE_NAMES[piece]], rect)
+            dirty.append(rect)
+        self.sprite_rects = [rect for _, rect in sprites]
 
-    # Draw the board (alternating colors)
-    def draw_board(self):
-        global colors
-        colors = [pg.Color(255, 206, 158), pg.Color(209, 139, 71)]
+        # The message goes back on top whenever something under it changed
+        if text is not None:
+            text_rect = self.get_text_rect(text)
+            if text != self.text or text_rect.collidelist(dirty) != -1:
+                self.draw_text(text)
+                dirty.append(text_rect)
+        elif self.text is not None:
+            # Squares under the old message are drawn again next frame
+            self.invalidate()
+        self.text = text
 
-        mouse_pos = self.key_manager.mouse_pos
-        hover_square = (mouse_pos[1] // SQ_SIZE, mouse_pos[0] // SQ_SIZE)
+        if dirty:
+            pg.display.update(dirty)
+        return bool(dirty)
 
-        for row in range(DIMENSION):
-            for col in range(DIMENSION):
-                color = colors[(row + col) % 2]
+    # Squares a rectangle overlaps
+    def get_squares_under(self, rect):
+        first_col, first_row = max(rect.left // SQ_SIZE, 0), max(rect.top // SQ_SIZE, 0)
+        last_col = min((rect.right - 1) // SQ_SIZE, DIMENSION - 1)
+        last_row = min((rect.bottom - 1) // SQ_SIZE, DIMENSION - 1)
+        return [row * DIMENSION + col for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
 
-                pg.draw.rect(self.screen, color, pg.Rect(
-                    col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+    # Forget what is on screen, so the next frame redraws every square
+    def invalidate(self):
+        self.square_states = [None] * (DIMENSION * DIMENSION)
 
-                # Highlight hover square
-                if hover_square == (row, col):
-                    pg.draw.rect(self.screen, pg.Color(255, 255, 100, 100),
-                                 pg.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE), 3)
-
-    # Draw the pieces on the board
-    def draw_pieces(self):
-        for row in range(DIMENSION):
-            for col in range(DIMENSION):
-                piece = self.game_state.board[row][col]
-                if piece != "--":  # If not an empty square
-                    self.screen.blit(IMAGES[piece], pg.Rect(
-                        col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+    # What a square should show: (piece, hovered, selected, move target, part of the last move)
+    def get_square_states(self, sq_selected, move_index, last_move):
+        squares = self.game_state.bitboards.squares
+        overrides = self.animator.overrides  # Squares pieces are still sliding to
+        mouse_pos = self.key_manager.hover_pos
+        hover = (mouse_pos[1] // SQ_SIZE) * DIMENSION + mouse_pos[0] // SQ_SIZE
 
-    # Draw moves and selected square
-    def highlight_squares(self, valid_moves, sq_selected):
+        selected = -1
+        targets = ()
         if sq_selected != ():
             r, c = sq_selected
             if self.game_state.board[r][c][0] == ("w" if self.game_state.white_to_move else "b"):
-                # Highlight selected square with a yellowish tint
-                pg.draw.rect(self.screen, pg.Color(255, 255, 100, 100),
-                             (c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE), 0)
-
-                # Highlight valid move destinations with a grayish circle
-                for move in valid_moves:
-                    if move.start_row == r and move.start_col == c:
-                        center = ((move.end_col * SQ_SIZE) + SQ_SIZE //
-                                  2, (move.end_row * SQ_SIZE) + SQ_SIZE // 2)
-                        radius = SQ_SIZE // 6  # Small indicator in the center
-                        pg.draw.circle(self.screen, pg.Color(
-                            255, 255, 100, 100), center, radius)
-
-    # Highlight the last move made
-    def last_move_made(self, move):
-        if move is not None:
-            start_square = pg.Rect(
-                move.start_col * SQ_SIZE, move.start_row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-            end_square = pg.Rect(move.end_col * SQ_SIZE,
-                                 move.end_row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-            # Reddish color for highlighting
-            highlight_color = pg.Color(255, 0, 0, 100)
-
-            pg.draw.rect(self.screen, highlight_color, start_square)
-            pg.draw.rect(self.screen, highlight_color, end_square)
+                selected = r * DIMENSION + c
+                targets = move_index.targets(selected)
+        last = (start_square(last_move), end_square(last_move)) if last_move is not None else ()
+
+        return [(overrides.get(sq, squares[sq]), sq == hover, sq == selected, sq in targets, sq in last)
+                for sq in range(DIMENSION * DIMENSION)]
+
+    # Draw one square in the given state. Returns its rectangle.
+    def draw_square(self, sq, state):
+        piece, hovered, selected, target, last = state
+        row, col = divmod(sq, DIMENSION)
+        rect = pg.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+        self.screen.blit(self.board_surface, rect, rect)
+        if hovered:
+            pg.draw.rect(self.screen, HIGHLIGHT_COLOR, rect, 3)
+        # Highlight the selected square with a yellowish tint and its move
+        # destinations with a small circle in the center
+        if selected:
+            pg.draw.rect(self.screen, HIGHLIGHT_COLOR, rect, 0)
+        if target:
+            pg.draw.circle(self.screen, HIGHLIGHT_COLOR, rect.center, SQ_SIZE // 6)
+        # Reddish highlight for the last move made
+        if last:
+            pg.draw.rect(self.screen, LAST_MOVE_COLOR, rect)
+        if piece != EMPTY:
+            self.screen.blit(IMAGES[PIECE_NAMES[piece]], rect)
+        return rect
+
+    # Render the empty board (alternating colors) once
+    def render_board(self):
+        surface = pg.Surface((WIDTH, HEIGHT))
+        for row in range(DIMENSION):
+            for col in range(DIMENSION):
+                pg.draw.rect(surface, BOARD_COLORS[(row + col) % 2], pg.Rect(
+                    col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+        return surface
 
     # Draw text on the screen
     def draw_text(self, text):
-        font = pg.font.SysFont("Arial", 32, True, False)
+        font = self.font
         text_object = font.render(text, 0, pg.Color("Gray"))
         text_location = pg.Rect(0, 0, WIDTH, HEIGHT).move(
             WIDTH / 2 - text_object.get_width() / 2, HEIGHT / 2 - text_object.get_height() / 2)
@@ -219,28 +285,31 @@ class Chess():
         text_object = font.render(text, 0, pg.Color("Black"))
         self.screen.blit(text_object, text_location.move(2, 2))
 
-    # Move animation
+    # Area draw_text covers, including the shadow
+    def get_text_rect(self, text):
+        width, height = self.font.size(text)
+        return pg.Rect(WIDTH // 2 - width // 2 - 1, HEIGHT // 2 - height // 2 - 1, width + 4, height + 4)
+
+    # Start animating a move that was just made. The pieces slide over the
+    # next frames while the game loop keeps running.
     def animate_move(self, move):
-        global colors
-        dR = move.end_row - move.start_row
-        dC = move.end_col - move.start_col
-        frames_per_square = 10  # Frames to move one square
-        frames_count = (abs(dR) + abs(dC)) * frames_per_square
-        for frame in range(frames_count + 1):
-            r, c = (move.start_row + dR * frame / frames_count,
-                    move.start_col + dC * frame / frames_count)
-            self.draw_board()
-            self.draw_pieces()
-            # Erase the piece from the ending square
-            color = colors[(move.end_row + move.end_col) % 2]
-            end_square = pg.Rect(
-                move.end_col * SQ_SIZE, move.end_row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-            pg.draw.rect(self.screen, color, end_square)
-            # Draw captured piece back
-            if move.piece_captured != "--":
-                self.screen.blit(IMAGES[move.piece_captured], end_square)
-            # Draw moving piece
-            self.screen.blit(IMAGES[move.piece_moved], pg.Rect(
-                int(c * SQ_SIZE), int(r * SQ_SIZE), SQ_SIZE, SQ_SIZE))
-            pg.display.flip()
-            self.clock.tick(MAX_FPS)
+        start = start_square(move)
+        end = end_square(move)
+        flags = move_flags(move)
+        squares = self.game_state.bitboards.squares
+        piece = squares[end]
+        if flags & PROMOTION:
+            piece = piece // 6 * 6 + PAWN  # The pawn slides, then turns into the new piece
+        captured = self.game_state.captured_log[-1]
+        moves = [(piece, start, end)]
+        # Until the piece arrives the captured piece stays on the board
+        overrides = {end: captured}
+        if flags == EN_PASSANT:
+            overrides = {end: EMPTY, start & ~7 | end & 7: captured}
+        elif flags == KING_CASTLE:
+            moves.append((squares[end - 1], end + 1, end - 1))
+            overrides[end - 1] = EMPTY
+        elif flags == QUEEN_CASTLE:
+            moves.append((squares[end + 1], end - 2, end + 1))
+            overrides[end + 1] = EMPTY
+        self.animator.animate(moves, overrides)
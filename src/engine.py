@@ -2,110 +2,332 @@
 Logic for the chess engine.
 """
 
-import numpy as np
+from bitboard import (Bitboards, iter_bits, rook_attacks, bishop_attacks, BETWEEN, KNIGHT_ATTACKS,
+                      PAWN_ATTACKS, PROMOTION_RANKS, FULL, WHITE, BLACK, EMPTY, KNIGHT, BISHOP, ROOK, QUEEN,
+                      PAWN, KING, WR, WK, BP, BR, BK, PIECE_TYPES)
 from pieces.pawn import Pawn
 from pieces.rook import Rook
 from pieces.knight import Knight
 from pieces.bishop import Bishop
 from pieces.queen import Queen
 from pieces.king import King
-from move import Move
+from move import (Move, encode, is_promotion, is_quiet, with_promotion, notation, SQUARE_NAMES, SQUARE_INDEX,
+                  NO_MOVE, MoveIndex, DOUBLE_PAWN_PUSH, CAPTURE, EN_PASSANT, KING_CASTLE, QUEEN_CASTLE, PROMOTION)
+from ordering import capture_score
+from evaluation import PIECE_VALUES
+import zobrist
+
+# Piece values for exchanges, where the king is worth more than anything
+EXCHANGE_VALUES = PIECE_VALUES[:KING] + [20000]
+
+# Pieces hold no state, so one move generator of each type is shared
+PIECE_MOVES = (Pawn(), Knight(), Bishop(), Rook(), Queen(), King())
+PAWN_MOVES = PIECE_MOVES[PAWN]
+KING_MOVES = PIECE_MOVES[KING]
+
+FIFTY_MOVE_PLIES = 100  # Plies without a capture or pawn move before a draw
+
+START_POSITION = (
+    ("bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"),
+    ("bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"),
+    ("--", "--", "--", "--", "--", "--", "--", "--"),
+    ("--", "--", "--", "--", "--", "--", "--", "--"),
+    ("--", "--", "--", "--", "--", "--", "--", "--"),
+    ("--", "--", "--", "--", "--", "--", "--", "--"),
+    ("wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"),
+    ("wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"),
+)
 
 
 class GameState:
     """
     Represents the current state of a chess game.
+
+    The position itself lives in self.bitboards; self.board is a read-only
+    board[row][col] view of it returning piece names such as "wP" or "--".
     """
 
     def __init__(self):
         """
         Initializes the chessboard, turn indicator, and move log.
         """
-        self.board = np.array([
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
-        ])
+        self.bitboards = Bitboards.from_rows(START_POSITION)
         self.white_to_move = True
-        self.move_log = []
+        self.move_log = []  # Packed moves, see move.py
+        self.captured_log = []  # Piece captured by each move in the move log, or EMPTY
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
         self.enpassant_possible = ()  # Co-ordinates of the square were enpassant is possible
+        self.enpassant_possible_log = [self.enpassant_possible]
         self.checkmate = False
         self.stalemate = False
         self.current_castling_rights = CastleRights(True, True, True, True)
         self.castle_rights_log = [CastleRights(self.current_castling_rights.bks, self.current_castling_rights.bqs,
                                                self.current_castling_rights.wks, self.current_castling_rights.wqs)]
+        self.zobrist_key = self.compute_zobrist_key()
+        self.zobrist_log = []  # Keys of the positions before each move in the move log
+        self.halfmove_clock = 0  # Plies since the last capture or pawn move
+        self.halfmove_clock_log = []  # Clock before each move in the move log
+        self.fullmove_number = 1  # Starts at 1 and goes up after each black move
+        self.move_index = None  # MoveIndex of the position with key move_index_key
+        self.move_index_key = None
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Builds a game state from a FEN string. The move counters may be
+        left out, as in EPD records.
+        """
+        fields = fen.split()
+        rows = []
+        for rank in fields[0].split("/"):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend(["--"] * int(char))
+                else:
+                    row.append(("w" if char.isupper() else "b") + char.upper())
+            rows.append(row)
+
+        game_state = cls()
+        game_state.bitboards = Bitboards.from_rows(rows)
+        game_state.white_to_move = fields[1] == "w"
+        castling = fields[2] if len(fields) > 2 else "-"
+        game_state.current_castling_rights = CastleRights(
+            "k" in castling, "q" in castling, "K" in castling, "Q" in castling)
+        game_state.castle_rights_log = [CastleRights(
+            "k" in castling, "q" in castling, "K" in castling, "Q" in castling)]
+        enpassant = fields[3] if len(fields) > 3 else "-"
+        if enpassant != "-":
+            game_state.enpassant_possible = (
+                Move.ranks_to_rows[enpassant[1]], Move.files_to_cols[enpassant[0]])
+        game_state.enpassant_possible_log = [game_state.enpassant_possible]
+        white_king = game_state.bitboards.king_square(WHITE)
+        black_king = game_state.bitboards.king_square(BLACK)
+        game_state.white_king_location = (white_king // 8, white_king % 8)
+        game_state.black_king_location = (black_king // 8, black_king % 8)
+        game_state.zobrist_key = game_state.compute_zobrist_key()
+        game_state.halfmove_clock = int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0
+        game_state.fullmove_number = int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else 1
+        return game_state
+
+    def to_fen(self):
+        """
+        Returns the FEN string of the current position.
+        """
+        squares = self.bitboards.squares
+        ranks = []
+        for row in range(8):
+            rank = ""
+            empty = 0
+            for piece in squares[row * 8:row * 8 + 8]:
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = PIECE_TYPES[piece % 6]
+                rank += letter if piece < BP else letter.lower()
+            ranks.append(rank + (str(empty) if empty else ""))
+        rights = self.current_castling_rights
+        castling = "".join(letter for letter, allowed in
+                           zip("KQkq", (rights.wks, rights.wqs, rights.bks, rights.bqs)) if allowed)
+        enpassant = "-"
+        if self.enpassant_possible:
+            row, col = self.enpassant_possible
+            enpassant = SQUARE_NAMES[row * 8 + col]
+        return (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling or '-'} {enpassant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def parse_move(self, text):
+        """
+        Returns the legal move written in coordinate notation (e.g. 'e2e4',
+        'e7e8q'), or None when there is no such move.
+        """
+        text = text.lower()  # Promotions may come as 'e7e8Q'
+        start = SQUARE_INDEX.get(text[:2])
+        end = SQUARE_INDEX.get(text[2:4])
+        if start is None or end is None:
+            return None
+        move = self.get_move_index().find(start, end, text[4:].upper() or None)
+        # A promotion letter on a move that isn't one is not a match
+        return move if move is not None and notation(move) == text else None
+
+    def parse_san(self, text):
+        """
+        Returns the legal move written in standard algebraic notation (e.g.
+        'Nf3', 'exd5', 'O-O', 'e8=Q+'), or None when there is no such move.
+        Check marks and annotations are ignored.
+        """
+        text = text.rstrip("+#!?").replace("0", "O")
+        valid_moves = self.get_valid_moves()
+        for move in valid_moves:
+            if self.san(move, valid_moves, checks=False) == text:
+                return move
+        return None
+
+    def san(self, move, valid_moves=None, checks=True):
+        """
+        Returns a legal move in standard algebraic notation, with a check or
+        mate mark unless checks is off. valid_moves saves generating the
+        legal moves again.
+        """
+        start = move & 63
+        end = move >> 6 & 63
+        flags = move >> 12
+        if flags == KING_CASTLE:
+            text = "O-O"
+        elif flags == QUEEN_CASTLE:
+            text = "O-O-O"
+        else:
+            squares = self.bitboards.squares
+            piece = squares[start]
+            capture = "x" if squares[end] != EMPTY or flags == EN_PASSANT else ""
+            if piece % 6 == PAWN:
+                text = (SQUARE_NAMES[start][0] if capture else "") + capture + SQUARE_NAMES[end]
+                if flags & PROMOTION:
+                    text += "=" + "NBRQ"[flags & 3]
+            else:
+                # Name the start file, rank or square when another piece of
+                # the same kind can move to the same square
+                if valid_moves is None:
+                    valid_moves = self.get_valid_moves()
+                others = [other & 63 for other in valid_moves
+                          if other >> 6 & 63 == end and squares[other & 63] == piece and other & 63 != start]
+                prefix = ""
+                if others:
+                    if all(other % 8 != start % 8 for other in others):
+                        prefix = SQUARE_NAMES[start][0]
+                    elif all(other // 8 != start // 8 for other in others):
+                        prefix = SQUARE_NAMES[start][1]
+                    else:
+                        prefix = SQUARE_NAMES[start]
+                text = PIECE_TYPES[piece % 6] + prefix + capture + SQUARE_NAMES[end]
+        if checks:
+            self.make_move(move)
+            if self.in_check():
+                text += "#" if not self.get_valid_moves() else "+"
+            self.undo_move()
+        return text
+
+    @property
+    def board(self):
+        """
+        Returns the board[row][col] compatibility view used by the renderer.
+        """
+        return self.bitboards.view
+
+    def compute_zobrist_key(self):
+        """
+        Returns the Zobrist key of the current position.
+
+        The piece placement part is kept up to date by the bitboards; side to
+        move, castling rights and the en passant file are added here. The en
+        passant file only counts when a pawn can actually capture there.
+        """
+        key = self.bitboards.key ^ zobrist.CASTLING_KEYS[zobrist.castling_index(self.current_castling_rights)]
+        color = WHITE if self.white_to_move else BLACK
+        if color == BLACK:
+            key ^= zobrist.SIDE_KEY
+        if self.enpassant_possible:
+            row, col = self.enpassant_possible
+            if PAWN_ATTACKS[color ^ 1][row * 8 + col] & self.bitboards.pieces[color * 6 + PAWN]:
+                key ^= zobrist.ENPASSANT_KEYS[col]
+        return key
 
     def make_move(self, move, promotion_type=None):
         """
         Executes a move on the board and updates game state.
+
+        move is a packed move (see move.py) or a Move wrapping one;
+        promotion_type ("Q", "R", "B" or "N") overrides the promotion piece.
         """
-        self.board[move.start_row][move.start_col] = "--"
-        self.board[move.end_row][move.end_col] = move.piece_moved
+        if not isinstance(move, int):
+            move = move.value
+        if promotion_type is not None and is_promotion(move):
+            move = with_promotion(move, promotion_type)
+        bitboards = self.bitboards
+        start = move & 63
+        end = move >> 6 & 63
+        flags = move >> 12
+        piece = bitboards.squares[start]
+        captured = bitboards.remove(end)
+        bitboards.move(start, end)
         self.move_log.append(move)
+        self.zobrist_log.append(self.zobrist_key)
+        self.halfmove_clock_log.append(self.halfmove_clock)
+        if piece % 6 == PAWN or captured != EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if not self.white_to_move:
+            self.fullmove_number += 1
 
         # Update king's location
-        if move.piece_moved == "wK":
-            self.white_king_location = (move.end_row, move.end_col)
-        elif move.piece_moved == "bK":
-            self.black_king_location = (move.end_row, move.end_col)
+        if piece == WK:
+            self.white_king_location = (end // 8, end % 8)
+        elif piece == BK:
+            self.black_king_location = (end // 8, end % 8)
 
         # Pawn Promotion
-        if move.is_pawn_promotion and promotion_type is not None:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + \
-                promotion_type
+        if flags & PROMOTION:
+            bitboards.remove(end)
+            bitboards.put(piece + KNIGHT + (flags & 3), end)
 
         # Enpassant capturing
-        if move.is_enpassant:
-            # Capturing the pawn
-            self.board[move.start_row][move.end_col] = "--"
+        if flags == EN_PASSANT:
+            # Capturing the pawn, which stands beside the start square
+            captured = bitboards.remove(start & ~7 | end & 7)
+        self.captured_log.append(captured)
 
         # Updating the enpassant square
         # Two square pawn advances
-        if move.piece_moved[1] == "P" and abs(move.start_row - move.end_row) == 2:
-            self.enpassant_possible = (
-                (move.start_row + move.end_row) // 2, move.end_col)
+        if flags == DOUBLE_PAWN_PUSH:
+            self.enpassant_possible = ((start + end) // 16, end % 8)
         else:
             self.enpassant_possible = ()
+        self.enpassant_possible_log.append(self.enpassant_possible)
 
         # Castling
-        if move.is_castle:
-            if move.end_col - move.start_col == 2:  # King side castle
-                self.board[move.end_row][move.end_col -
-                                         1] = self.board[move.end_row][move.end_col + 1]
-                self.board[move.end_row][move.end_col + 1] = "--"
-            else:  # Queen side castle
-                self.board[move.end_row][move.end_col +
-                                         1] = self.board[move.end_row][move.end_col - 2]
-                self.board[move.end_row][move.end_col - 2] = "--"
+        if flags == KING_CASTLE:
+            bitboards.move(end + 1, end - 1)
+        elif flags == QUEEN_CASTLE:
+            bitboards.move(end - 2, end + 1)
 
         # Updating the castling rights
-        if move.piece_moved == "wK":
+        if piece == WK:
             self.current_castling_rights.wks = False
             self.current_castling_rights.wqs = False
-        elif move.piece_moved == "bK":
+        elif piece == BK:
             self.current_castling_rights.bks = False
             self.current_castling_rights.bqs = False
-        elif move.piece_moved == "wR" and move.start_row == 7:
-            if move.start_col == 0:  # Left rook
+        elif piece == WR:
+            if start == 56:  # Left rook
                 self.current_castling_rights.wqs = False
-            elif move.start_col == 7:  # Right rook
+            elif start == 63:  # Right rook
                 self.current_castling_rights.wks = False
-        elif move.piece_moved == "bR" and move.start_row == 0:
-            if move.start_col == 0:
+        elif piece == BR:
+            if start == 0:
                 self.current_castling_rights.bqs = False
-            elif move.start_col == 7:
+            elif start == 7:
+                self.current_castling_rights.bks = False
+        # A rook captured on its starting square takes its castling right with it
+        if captured == WR:
+            if end == 56:
+                self.current_castling_rights.wqs = False
+            elif end == 63:
+                self.current_castling_rights.wks = False
+        elif captured == BR:
+            if end == 0:
+                self.current_castling_rights.bqs = False
+            elif end == 7:
                 self.current_castling_rights.bks = False
         self.castle_rights_log.append(CastleRights(self.current_castling_rights.bks, self.current_castling_rights.bqs,
                                                    self.current_castling_rights.wks, self.current_castling_rights.wqs))
 
         self.white_to_move = not self.white_to_move
+        self.zobrist_key = self.compute_zobrist_key()
 
     def undo_move(self):
         """
@@ -113,24 +335,29 @@ class GameState:
         """
         if len(self.move_log) != 0:
             move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
+            captured = self.captured_log.pop()
+            bitboards = self.bitboards
+            start = move & 63
+            end = move >> 6 & 63
+            flags = move >> 12
+            piece = bitboards.remove(end)
+            if flags & PROMOTION:
+                piece = piece // 6 * 6 + PAWN
+            bitboards.put(piece, start)
+            if captured != EMPTY:
+                if flags == EN_PASSANT:
+                    bitboards.put(captured, start & ~7 | end & 7)
+                else:
+                    bitboards.put(captured, end)
 
             # Update king's location
-            if move.piece_moved == "wK":
-                self.white_king_location = (move.start_row, move.start_col)
-            elif move.piece_moved == "bK":
-                self.black_king_location = (move.start_row, move.start_col)
-
-            # Enpassant
-            if move.is_enpassant:
-                self.board[move.end_row][move.end_col] = "--"
-                self.board[move.start_row][move.end_col] = move.piece_captured
-                self.enpassant_possible = (move.end_row, move.end_col)
+            if piece == WK:
+                self.white_king_location = (start // 8, start % 8)
+            elif piece == BK:
+                self.black_king_location = (start // 8, start % 8)
 
-            # 2 Rank pawn advance
-            if move.piece_moved[1] == "P" and abs(move.start_row - move.end_row) == 2:
-                self.enpassant_possible = ()
+            self.enpassant_possible_log.pop()
+            self.enpassant_possible = self.enpassant_possible_log[-1]
 
             # Castling rights
             self.castle_rights_log.pop()
@@ -143,52 +370,108 @@ class GameState:
             )
 
             # Castle
-            if move.is_castle:
-                if move.end_col - move.start_col == 2:
-                    self.board[move.end_row][move.end_col +
-                                             1] = self.board[move.end_row][move.end_col - 1]
-                    self.board[move.end_row][move.end_col - 1] = "--"
-                else:
-                    self.board[move.end_row][move.end_col -
-                                             2] = self.board[move.end_row][move.end_col + 1]
-                    self.board[move.end_row][move.end_col + 1] = "--"
+            if flags == KING_CASTLE:
+                bitboards.move(end - 1, end + 1)
+            elif flags == QUEEN_CASTLE:
+                bitboards.move(end + 1, end - 2)
 
             self.white_to_move = not self.white_to_move
-            
+            self.zobrist_key = self.zobrist_log.pop()
+            self.halfmove_clock = self.halfmove_clock_log.pop()
+            if not self.white_to_move:
+                self.fullmove_number -= 1
+
             self.checkmate = False
             self.stalemate = False
 
-    def get_valid_moves(self):
+    def make_null_move(self):
         """
-        Returns all valid moves, filtering out moves that leave the king in check.
+        Passes the turn without moving, for null move pruning in the search.
+        Taken back with undo_null_move before any other move is undone.
         """
-        # Temp to store current enpassant possible to later revert
-        temp_enpassant_possible = self.enpassant_possible
-        # Temp for the castle rights
-        temp_castle_rights = CastleRights(self.current_castling_rights.bks, self.current_castling_rights.bqs,
-                                          self.current_castling_rights.wks, self.current_castling_rights.wqs)
+        self.zobrist_log.append(self.zobrist_key)
+        self.halfmove_clock_log.append(self.halfmove_clock)
+        self.halfmove_clock = 0  # No repetition reaches back across a pass
+        self.enpassant_possible = ()
+        self.enpassant_possible_log.append(self.enpassant_possible)
+        self.white_to_move = not self.white_to_move
+        self.zobrist_key = self.compute_zobrist_key()
 
-        moves = self.get_all_possible_moves()
-        if self.white_to_move:
-            self.get_castle_moves(
-                self.white_king_location[0], self.white_king_location[1], moves)
-        else:
-            self.get_castle_moves(
-                self.black_king_location[0], self.black_king_location[1], moves)
+    def undo_null_move(self):
+        self.white_to_move = not self.white_to_move
+        self.enpassant_possible_log.pop()
+        self.enpassant_possible = self.enpassant_possible_log[-1]
+        self.zobrist_key = self.zobrist_log.pop()
+        self.halfmove_clock = self.halfmove_clock_log.pop()
 
-        valid_moves = []
+    def has_non_pawn_material(self):
+        """
+        True when the side to move has a piece besides its king and pawns.
+        Without one, zugzwang is common and passing is no safe guess.
+        """
+        pieces = self.bitboards.pieces
+        base = 0 if self.white_to_move else 6
+        return bool(pieces[base + KNIGHT] | pieces[base + BISHOP] | pieces[base + ROOK] | pieces[base + QUEEN])
 
-        for move in moves:
-            self.make_move(move)
-            self.white_to_move = not self.white_to_move  # Simulate opponent's turn
-            if not self.in_check():
-                valid_moves.append(move)
-            self.white_to_move = not self.white_to_move  # Undo simulation
-            self.undo_move()
+    def is_repetition(self, times=1):
+        """
+        True when the position occurred at least times times before. Only
+        positions since the last capture or pawn move can be the same, and
+        only every other one has the same side to move, so at most
+        halfmove_clock / 2 keys are compared.
+        """
+        key = self.zobrist_key
+        log = self.zobrist_log
+        count = 0
+        for i in range(len(log) - 2, max(len(log) - self.halfmove_clock, 0) - 1, -2):
+            if log[i] == key:
+                count += 1
+                if count >= times:
+                    return True
+        return False
+
+    def insufficient_material(self):
+        """
+        True with no pawns, rooks or queens left and at most one minor piece
+        on each side, where neither side can mate.
+        """
+        pieces = self.bitboards.pieces
+        for color in (WHITE, BLACK):
+            base = color * 6
+            if pieces[base + PAWN] or pieces[base + ROOK] or pieces[base + QUEEN]:
+                return False
+            minors = pieces[base + KNIGHT] | pieces[base + BISHOP]
+            if minors & (minors - 1):
+                return False
+        return True
+
+    def draw_reason(self):
+        """
+        Returns why the game is drawn by rule, "repetition", "fifty moves"
+        or "insufficient material", or None. Call it after get_valid_moves,
+        as a mate on the last of fifty moves still counts.
+        """
+        if self.is_repetition(2):
+            return "repetition"
+        if self.halfmove_clock >= FIFTY_MOVE_PLIES and not self.checkmate:
+            return "fifty moves"
+        if self.insufficient_material():
+            return "insufficient material"
+        return None
+
+    def get_valid_moves(self):
+        """
+        Returns all legal moves.
+
+        Checkers, pinned pieces and the squares attacked by the opponent are
+        computed once, and each piece is only asked for moves that keep the
+        king safe, so no move has to be played to test it.
+        """
+        moves, checkers = self.generate_legal_moves(FULL)
 
         # Either stalemate or checkmate
-        if len(valid_moves) == 0:
-            if self.in_check():
+        if len(moves) == 0:
+            if checkers:
                 self.checkmate = True
             else:
                 self.stalemate = True
@@ -196,10 +479,255 @@ class GameState:
             self.stalemate = False
             self.checkmate = False
 
-        self.enpassant_possible = temp_enpassant_possible
-        self.current_castling_rights = temp_castle_rights
+        return moves
+
+    def get_move_index(self, valid_moves=None):
+        """
+        Returns the MoveIndex of the legal moves, built once per position.
+        valid_moves, when already generated, saves generating them again.
+        """
+        if self.move_index is None or self.move_index_key != self.zobrist_key:
+            self.move_index = MoveIndex(self.get_valid_moves() if valid_moves is None else valid_moves)
+            self.move_index_key = self.zobrist_key
+        return self.move_index
+
+    def get_capture_moves(self):
+        """
+        Returns only the legal captures and promotions, for the quiescence
+        search. Unlike get_valid_moves it leaves the checkmate and stalemate
+        flags alone, as having no captures says nothing about either.
+        """
+        enemy = self.bitboards.colors[BLACK if self.white_to_move else WHITE]
+        return self.generate_legal_moves(enemy)[0]
+
+    def generate_staged_moves(self, hash_move=NO_MOVE, killers=(), history=None):
+        """
+        Yields the legal moves one at a time in stages: the hash move, the
+        winning captures and promotions (most valuable victim first), the
+        killer moves, the quiet moves (by their history[move & 4095] score)
+        and last the captures that lose material.
+
+        Each stage is only generated when the consumer asks for its first
+        move, so a search that cuts off on the hash move or a capture never
+        generates the quiet moves. The position may change between moves as
+        long as it is restored before the next one is asked for.
+        """
+        masks = self.get_legal_masks()
+        if hash_move and self.is_legal_move(hash_move, masks):
+            yield hash_move
+
+        bitboards = self.bitboards
+        color = WHITE if self.white_to_move else BLACK
+        squares = bitboards.squares
+        enemy = bitboards.colors[color ^ 1]
+        captures = self.generate_legal_moves(enemy, masks, castling=False)[0]
+        captures.sort(key=lambda move: capture_score(squares, move), reverse=True)
+        losing_captures = []
+        for move in captures:
+            if move == hash_move:
+                continue
+            if self.is_losing_capture(move):
+                losing_captures.append(move)
+            else:
+                yield move
+
+        for move in killers:
+            if move and is_quiet(move) and move != hash_move and self.is_legal_move(move, masks):
+                yield move
+
+        empty = ~bitboards.occupied & FULL
+        quiets = self.generate_legal_moves(empty, masks, empty & ~PROMOTION_RANKS[color], False, True)[0]
+        if history is not None:
+            quiets.sort(key=lambda move: history[move & 4095], reverse=True)
+        for move in quiets:
+            if move != hash_move and move not in killers:
+                yield move
+
+        yield from losing_captures
+
+    def is_losing_capture(self, move):
+        """
+        A capture of a cheaper piece that loses material once the exchange
+        on its square is played out. Promotions and en passant never count
+        as losing.
+        """
+        if move >> 12 != CAPTURE:
+            return False
+        squares = self.bitboards.squares
+        if PIECE_VALUES[squares[move >> 6 & 63] % 6] >= PIECE_VALUES[squares[move & 63] % 6]:
+            return False
+        return self.static_exchange(move) < 0
+
+    def static_exchange(self, move):
+        """
+        Returns the material the side to move wins with a capture when both
+        sides keep recapturing on its square with their least valuable
+        attacker, and may stop whenever that is better for them. Sliders
+        behind the capturing pieces join in as the pieces leave.
+        """
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        start = move & 63
+        end = move >> 6 & 63
+        color = WHITE if self.white_to_move else BLACK
+        gains = [EXCHANGE_VALUES[bitboards.squares[end] % 6]]
+        attacker_value = EXCHANGE_VALUES[bitboards.squares[start] % 6]
+        occupied = bitboards.occupied ^ (1 << start)
+        side = color ^ 1
+        while True:
+            attackers = bitboards.attackers(end, side, occupied) & occupied
+            if not attackers:
+                break
+            base = side * 6
+            for piece_type in range(6):
+                attacker = attackers & pieces[base + piece_type]
+                if attacker:
+                    break
+            # The capture is answered, so this side now stands to win the
+            # piece that just captured minus what it won before
+            gains.append(attacker_value - gains[-1])
+            if max(-gains[-2], gains[-1]) < 0:
+                # Neither side can come out ahead by going on
+                gains.pop()
+                break
+            occupied ^= attacker & -attacker
+            attacker_value = EXCHANGE_VALUES[piece_type]
+            side ^= 1
+        # Each side takes the better of recapturing or stopping
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def is_legal_move(self, move, masks=None):
+        """
+        Checks a move from another position (a hash or killer move) by
+        generating only the moves of its piece onto its end square.
+        """
+        start = move & 63
+        end = move >> 6 & 63
+        piece = self.bitboards.squares[start]
+        color = WHITE if self.white_to_move else BLACK
+        if piece == EMPTY or piece // 6 != color:
+            return False
+        flags = move >> 12
+        target = 1 << end
+        moves = self.generate_legal_moves(target, masks, target, flags == EN_PASSANT,
+                                          flags == KING_CASTLE or flags == QUEEN_CASTLE, 1 << start)[0]
+        return move in moves
+
+    def get_legal_masks(self):
+        """
+        Returns (king square, squares attacked by the opponent, checkers,
+        check mask, pin masks) for the side to move: what legal move
+        generation needs to keep the king safe. The check mask holds the
+        squares that capture or block a single checker, and is 0 in double
+        check where only the king can move.
+        """
+        bitboards = self.bitboards
+        color = WHITE if self.white_to_move else BLACK
+        enemy = color ^ 1
+        occupied = bitboards.occupied
+        king_sq = bitboards.king_square(color)
+
+        # The king is removed so it cannot step back along a checking ray
+        attacked = bitboards.attack_map(enemy, occupied ^ (1 << king_sq))
+        checkers = bitboards.attackers(king_sq, enemy, occupied)
+
+        if checkers & (checkers - 1):
+            check_mask = 0
+        elif checkers:
+            # Capture the checker or block the checking ray
+            check_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+        return king_sq, attacked, checkers, check_mask, self.get_pins(king_sq, color)
+
+    def generate_legal_moves(self, targets, masks=None, pawn_targets=None, enpassant=True,
+                             castling=None, sources=FULL):
+        """
+        Returns (legal moves of the pieces on sources landing on a square in
+        targets, checkers).
 
-        return valid_moves
+        Pawns move onto pawn_targets instead, which by default adds the
+        promotions onto an empty square. En passant is included unless
+        turned off; castling by default only when every square is a target.
+        """
+        bitboards = self.bitboards
+        color = WHITE if self.white_to_move else BLACK
+        if masks is None:
+            masks = self.get_legal_masks()
+        king_sq, attacked, checkers, check_mask, pin_masks = masks
+        if pawn_targets is None:
+            pawn_targets = targets | PROMOTION_RANKS[color]
+        if castling is None:
+            castling = targets == FULL
+
+        moves = []
+        if sources >> king_sq & 1:
+            KING_MOVES.get_moves(bitboards, color, king_sq, moves, ~attacked & targets)
+            if castling:
+                self.get_castle_moves(king_sq // 8, king_sq % 8, moves, attacked)
+
+        # In double check only the king can move
+        if check_mask:
+            squares = bitboards.squares
+            if enpassant and self.enpassant_possible:
+                ep_sq = self.enpassant_possible[0] * 8 + self.enpassant_possible[1]
+            else:
+                ep_sq = -1
+            for sq in iter_bits(bitboards.colors[color] & sources & ~(1 << king_sq)):
+                piece_type = squares[sq] % 6
+                target_mask = pin_masks.get(sq, FULL) & check_mask
+                if piece_type == PAWN:
+                    pawn_ep_sq = ep_sq
+                    if ep_sq >= 0 and PAWN_ATTACKS[color][sq] >> ep_sq & 1 and \
+                            not self.enpassant_is_legal(sq, ep_sq, king_sq):
+                        pawn_ep_sq = -1
+                    PAWN_MOVES.get_moves(bitboards, color, sq, moves, target_mask & pawn_targets, pawn_ep_sq)
+                else:
+                    PIECE_MOVES[piece_type].get_moves(bitboards, color, sq, moves, target_mask & targets)
+
+        return moves, checkers
+
+    def get_pins(self, king_sq, color):
+        """
+        Returns {square: allowed destinations} for every piece of the given
+        color that is pinned to its king.
+        """
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        base = (color ^ 1) * 6
+        own = bitboards.colors[color]
+        enemy = bitboards.colors[color ^ 1]
+        queens = pieces[base + QUEEN]
+        # Enemy sliders that would attack the king if our pieces were not there
+        snipers = ((rook_attacks(king_sq, enemy) & (pieces[base + ROOK] | queens)) |
+                   (bishop_attacks(king_sq, enemy) & (pieces[base + BISHOP] | queens)))
+        pin_masks = {}
+        for sniper in iter_bits(snipers):
+            between = BETWEEN[king_sq][sniper]
+            blockers = between & bitboards.occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+                pin_masks[blockers.bit_length() - 1] = between | (1 << sniper)
+        return pin_masks
+
+    def enpassant_is_legal(self, start_sq, ep_sq, king_sq):
+        """
+        Checks an en passant capture for the discovered checks that pin masks
+        miss, such as both pawns leaving the king's rank at once.
+        """
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        color = WHITE if self.white_to_move else BLACK
+        base = (color ^ 1) * 6
+        captured_sq = start_sq // 8 * 8 + ep_sq % 8
+        occupied = bitboards.occupied ^ (1 << start_sq) ^ (1 << captured_sq) | (1 << ep_sq)
+        # A knight check can't be answered by an en passant capture
+        if KNIGHT_ATTACKS[king_sq] & pieces[base + KNIGHT]:
+            return False
+        queens = pieces[base + QUEEN]
+        return not ((rook_attacks(king_sq, occupied) & (pieces[base + ROOK] | queens)) or
+                    (bishop_attacks(king_sq, occupied) & (pieces[base + BISHOP] | queens)))
 
     def in_check(self):
         """
@@ -214,71 +742,62 @@ class GameState:
         """
         Checks if the given square is under attack by the opponent.
         """
-        self.white_to_move = not self.white_to_move
-        opp_moves = self.get_all_possible_moves()
-        self.white_to_move = not self.white_to_move
-
-        return any(move.end_row == row and move.end_col == col for move in opp_moves)
+        enemy = BLACK if self.white_to_move else WHITE
+        return self.bitboards.attackers(row * 8 + col, enemy, self.bitboards.occupied) != 0
 
     def get_all_possible_moves(self):
         """
-        Generates all possible moves for the current player.
+        Generates all pseudo-legal moves for the current player, ignoring
+        checks and castling.
         """
         moves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece_type = self.board[row][col][1]
-                    self.get_piece_moves(piece_type, row, col, moves)
+        bitboards = self.bitboards
+        color = WHITE if self.white_to_move else BLACK
+        for sq in iter_bits(bitboards.colors[color]):
+            self.get_piece_moves(bitboards.squares[sq] % 6, sq, moves)
         return moves
 
-    def get_piece_moves(self, piece_type, row, col, moves):
-        """
-        Generates moves for a specific piece based on its type.
-        """
-        piece_classes = {
-            "P": Pawn,
-            "R": Rook,
-            "N": Knight,
-            "B": Bishop,
-            "Q": Queen,
-            "K": King
-        }
-        piece_class = piece_classes.get(piece_type)
-        if piece_class:
-            if piece_type == "P":
-                piece = piece_class(
-                    self.board, self.white_to_move, self.enpassant_possible)
-            else:
-                piece = piece_class(self.board, self.white_to_move)
-            moves.extend(piece.get_moves(row, col))
+    def get_piece_moves(self, piece_type, sq, moves, target_mask=FULL):
+        """
+        Generates moves for the piece of the given type on sq, restricted
+        to the destination squares in target_mask.
+        """
+        color = WHITE if self.white_to_move else BLACK
+        if piece_type == PAWN:
+            ep_sq = -1
+            if self.enpassant_possible:
+                ep_sq = self.enpassant_possible[0] * 8 + self.enpassant_possible[1]
+            PAWN_MOVES.get_moves(self.bitboards, color, sq, moves, target_mask, ep_sq)
+        else:
+            PIECE_MOVES[piece_type].get_moves(self.bitboards, color, sq, moves, target_mask)
 
     # Generate castle moves according to the current casting rights
-    def get_castle_moves(self, rows, cols, moves):
-        if self.square_under_attack(rows, cols):
+    def get_castle_moves(self, rows, cols, moves, attacked):
+        if attacked >> (rows * 8 + cols) & 1:
             return  # We can't castle as the king is in check
         if (self.white_to_move and self.current_castling_rights.wks) or (
                 not self.white_to_move and self.current_castling_rights.bks):
-            self.get_king_side_castle_moves(rows, cols, moves)
+            self.get_king_side_castle_moves(rows, cols, moves, attacked)
         if (self.white_to_move and self.current_castling_rights.wqs) or (
                 not self.white_to_move and self.current_castling_rights.bqs):
-            self.get_queen_side_castle_moves(rows, cols, moves)
-
-    def get_king_side_castle_moves(self, rows, cols, moves):
-        if self.board[rows][cols + 1] == "--" and self.board[rows][cols + 2] == "--" and not self.square_under_attack(
-                rows, cols + 1) and not self.square_under_attack(rows, cols + 2):
-            moves.append(Move((rows, cols), (rows, cols + 2),
-                         self.board, is_castle=True))
-
-    def get_queen_side_castle_moves(self, rows, cols, moves):
-        if (self.board[rows][cols - 1] == "--" and self.board[rows][cols - 2] == "--" and
-                self.board[rows][cols - 3] == "--" and
-                not self.square_under_attack(rows, cols - 1) and
-                not self.square_under_attack(rows, cols - 2)):
-            moves.append(Move((rows, cols), (rows, cols - 2),
-                         self.board, is_castle=True))
-
+            self.get_queen_side_castle_moves(rows, cols, moves, attacked)
+
+    def get_king_side_castle_moves(self, rows, cols, moves, attacked):
+        squares = self.bitboards.squares
+        sq = rows * 8 + cols
+        # The king may not pass through or land on an attacked square
+        if (squares[sq + 1] == EMPTY and squares[sq + 2] == EMPTY and
+                not attacked >> (sq + 1) & 1 and not attacked >> (sq + 2) & 1):
+            moves.append(encode(sq, sq + 2, KING_CASTLE))
+
+    def get_queen_side_castle_moves(self, rows, cols, moves, attacked):
+        squares = self.bitboards.squares
+        sq = rows * 8 + cols
+        if (squares[sq - 1] == EMPTY and squares[sq - 2] == EMPTY and
+                squares[sq - 3] == EMPTY and
+                not attacked >> (sq - 1) & 1 and
+                not attacked >> (sq - 2) & 1):
+            moves.append(encode(sq, sq - 2, QUEEN_CASTLE))
 
 class CastleRights:
     def __init__(self, bks, bqs, wks, wqs):
@@ -0,0 +1,165 @@
+'''
+EPD test suite runner: searches every position of a suite and checks the
+move found against its best move (bm) or avoid move (am) opcodes.
+
+    python src/epd.py suites/wac.epd --time 1
+    python src/epd.py suites/wac.epd --nodes 200000 --workers 4
+    python src/epd.py suites/wac.epd --depth 6 --disable null_move,futility
+
+Positions are searched in parallel worker processes, one per core by
+default. For every position it reports whether it was solved, the time and
+nodes it took to settle on a solution, the depth reached and the
+nodes/second; the totals make it the standard tactical and speed benchmark.
+At a fixed depth, the effective branching factor (nodes to the power of
+1 / depth) shows what the selective search saves; --disable turns parts
+of it off.
+'''
+
+import argparse
+import multiprocessing
+import os
+import re
+import time
+
+import ai
+from engine import GameState
+from transposition import TranspositionTable
+
+OPERATION = re.compile(r'\s*(\w+)\s+("[^"]*"|[^;]*);')
+
+
+def parse_epd(line):
+    """
+    Splits an EPD record into its FEN fields and a dict of its operations,
+    e.g. {"bm": ["Qg6"], "id": ["WAC.001"]}.
+    """
+    fields = line.split(None, 4)
+    operations = {}
+    for opcode, operands in OPERATION.findall(fields[4] if len(fields) > 4 else ""):
+        if operands.startswith('"'):
+            operations[opcode] = [operands.strip('"')]
+        else:
+            operations[opcode] = operands.split()
+    return " ".join(fields[:4]), operations
+
+
+def read_suite(path):
+    with open(path) as file:
+        return [parse_epd(line) for line in file if line.strip() and not line.startswith("#")]
+
+
+'''
+Worker processes keep one transposition table, cleared for every position.
+'''
+
+table = None
+
+
+def init_worker(hash_mb):
+    global table
+    table = TranspositionTable(hash_mb)
+
+
+def solve(task):
+    """
+    Searches one position and returns a dict with the result.
+    """
+    number, fen, operations, time_limit, node_limit, max_depth, disabled = task
+    game_state = GameState.from_fen(fen)
+    best = {game_state.parse_san(text) for text in operations.get("bm", ())}
+    avoid = {game_state.parse_san(text) for text in operations.get("am", ())}
+    valid_moves = game_state.get_valid_moves()
+    # Time and nodes from which the search kept choosing a solution
+    found = [None, None]
+
+    def solves(move):
+        return move in best if best else move not in avoid
+
+    def info(search):
+        if not solves(search.best_move):
+            found[:] = None, None
+        elif found[0] is None:
+            found[:] = search.elapsed(), search.nodes
+
+    table.clear()
+    search = ai.Search(game_state, table, time_limit, node_limit, info=info)
+    for name in disabled:
+        setattr(search, name, False)
+    move = search.iterative_deepening(valid_moves, max_depth)
+    seconds = search.elapsed()
+    return {
+        "number": number,
+        "id": operations.get("id", [str(number + 1)])[0],
+        "move": game_state.san(move),
+        "expected": " ".join(operations.get("bm", ())) or "not " + " ".join(operations.get("am", ())),
+        "solved": solves(move),
+        "solve_time": found[0],
+        "solve_nodes": found[1],
+        "depth": search.completed_depth,
+        "nodes": search.nodes,
+        "seconds": seconds,
+    }
+
+
+def run_suite(records, time_limit, node_limit, max_depth, workers, hash_mb=ai.HASH_SIZE_MB, disabled=()):
+    """
+    Searches every record of a suite, printing the results in suite order.
+    disabled names the parts of the selective search to turn off (see
+    ai.PRUNING_OPTIONS). Returns the number of positions solved.
+    """
+    tasks = [(number, fen, operations, time_limit, node_limit, max_depth, disabled)
+             for number, (fen, operations) in enumerate(records)]
+    solved = 0
+    nodes = 0
+    seconds = 0.0
+    solve_time = 0.0
+    branching = 0.0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, init_worker, (hash_mb,)) as pool:
+        for result in pool.imap(solve, tasks):
+            nodes += result["nodes"]
+            seconds += result["seconds"]
+            if result["solved"]:
+                solved += 1
+                solve_time += result["solve_time"]
+                status = f"solved in {result['solve_time']:.3f}s / {result['solve_nodes']} nodes"
+            else:
+                status = f"FAILED (expected {result['expected']})"
+            nps = result["nodes"] / result["seconds"] if result["seconds"] > 0 else 0
+            ebf = result["nodes"] ** (1 / result["depth"]) if result["depth"] else 0
+            branching += ebf
+            print(f"{result['id']:<12} {result['move']:<8} depth {result['depth']:<3} "
+                  f"nodes {result['nodes']:<9} ebf {ebf:5.2f} nps {nps:>9,.0f}  {status}", flush=True)
+    print(f"solved {solved}/{len(records)}  "
+          f"average time to solve {solve_time / solved if solved else 0:.3f}s  "
+          f"nodes {nodes}  average ebf {branching / len(records) if records else 0:.2f}  "
+          f"nps {nodes / seconds if seconds > 0 else 0:,.0f}  "
+          f"wall time {time.perf_counter() - start:.1f}s")
+    return solved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an EPD test suite.")
+    parser.add_argument("suite", help="EPD file with bm or am opcodes")
+    parser.add_argument("--time", type=float, help="Seconds per position")
+    parser.add_argument("--nodes", type=int, help="Nodes per position")
+    parser.add_argument("--depth", type=int, default=ai.MAX_DEPTH, help="Maximum depth per position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Positions searched at once")
+    parser.add_argument("--hash", type=int, default=ai.HASH_SIZE_MB, help="Table size per worker in MB")
+    parser.add_argument("--disable", default="",
+                        help="Comma separated parts of the selective search to turn off: " +
+                             ", ".join(ai.PRUNING_OPTIONS))
+    args = parser.parse_args()
+    disabled = tuple(filter(None, args.disable.split(",")))
+    for name in disabled:
+        if name not in ai.PRUNING_OPTIONS:
+            parser.error(f"unknown search option {name}")
+
+    time_limit = args.time
+    if time_limit is None and args.nodes is None and args.depth == ai.MAX_DEPTH:
+        time_limit = ai.TIME_LIMIT
+    run_suite(read_suite(args.suite), time_limit, args.nodes, args.depth, args.workers, args.hash, disabled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+'''
+Material and piece-square evaluation.
+
+Scores are in centipawns from white's point of view. Every table is laid out
+like the board (index row * 8 + col, row 0 is rank 8) from white's side and
+is mirrored for black. The tables are folded with the piece values into one
+signed midgame and one endgame array per piece, so the bitboards can keep
+running totals with a single lookup per changed square.
+'''
+
+PAWN_VALUE = 100
+# Pawn, knight, bishop, rook, queen, king
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+MIDGAME_VALUES = [100, 320, 330, 500, 900, 0]
+ENDGAME_VALUES = [120, 300, 320, 520, 900, 0]
+
+# Game phase: 24 with all pieces on the board, 0 with only kings and pawns
+PHASE_VALUES = [0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+PAWN_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0
+]
+
+PAWN_ENDGAME_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    90, 90, 90, 90, 90, 90, 90, 90,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0
+]
+
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50
+]
+
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20
+]
+
+ROOK_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0
+]
+
+QUEEN_TABLE = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20
+]
+
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20
+]
+
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50
+]
+
+MIDGAME_TABLES = [PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+ENDGAME_TABLES = [PAWN_ENDGAME_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE,
+                  KING_ENDGAME_TABLE]
+
+
+def _piece_tables(values, tables):
+    """
+    Builds [piece][square] arrays of value + table entry, positive for the
+    white pieces and negative (and mirrored) for the black ones, indexed
+    like the bitboard pieces (color * 6 + piece_type).
+    """
+    white = [[values[t] + tables[t][sq] for sq in range(64)] for t in range(6)]
+    black = [[-(values[t] + tables[t][sq ^ 56]) for sq in range(64)] for t in range(6)]
+    return white + black
+
+
+MIDGAME_SCORES = _piece_tables(MIDGAME_VALUES, MIDGAME_TABLES)
+ENDGAME_SCORES = _piece_tables(ENDGAME_VALUES, ENDGAME_TABLES)
+PHASE_WEIGHTS = PHASE_VALUES + PHASE_VALUES
+
+
+def evaluate(bitboards):
+    """
+    Returns the tapered score of the running totals, from white's side.
+    """
+    phase = min(bitboards.phase, MAX_PHASE)
+    return (bitboards.midgame * phase + bitboards.endgame * (MAX_PHASE - phase)) // MAX_PHASE
@@ -9,8 +9,10 @@ class KeyManager:
         self.quit = False
         self.mouse_button_down = False
         self.mouse_pos = (0, 0)
+        self.hover_pos = (0, 0)
         self.backspace_pressed = False
         self.reset_pressed = False
+        self.exposed = False
 
     def handle_events(self):
         self.reset_flags()
@@ -19,7 +21,12 @@ class KeyManager:
                 self.quit = True
             elif event.type == pg.MOUSEBUTTONDOWN:
                 self.mouse_button_down = True
-                self.mouse_pos = pg.mouse.get_pos()
+                self.mouse_pos = event.pos
+                self.hover_pos = event.pos
+            elif event.type == pg.MOUSEMOTION:
+                self.hover_pos = event.pos
+            elif event.type in (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED):
+                self.exposed = True
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_BACKSPACE:
                     self.backspace_pressed = True
@@ -30,4 +37,5 @@ class KeyManager:
         self.quit = False
         self.mouse_button_down = False
         self.backspace_pressed = False
-        self.reset_pressed = False
\ No newline at end of file
+        self.reset_pressed = False
+        self.exposed = False
\ No newline at end of file
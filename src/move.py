@@ -1,11 +1,133 @@
 '''
-class Move represents a chess move with start and end positions, and metadata.
+Moves are packed into 16-bit integers:
+
+    bits 0-5    start square (row * 8 + col)
+    bits 6-11   end square
+    bits 12-15  flags
+
+so the engine, the search and its tables handle moves as plain ints.
+class Move wraps one together with the piece names for the UI.
 '''
 
+# Flags. Captures have bit 2 set and promotions bit 3; the two low bits of a
+# promotion pick the new piece from PROMOTION_TYPES.
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8
+PROMOTION_TYPES = "NBRQ"
+
+NO_MOVE = 0  # a8 to a8, never a legal move
+
+# Square index to coordinate name, "a8" for 0 up to "h1" for 63
+SQUARE_NAMES = [file + rank for rank in "87654321" for file in "abcdefgh"]
+SQUARE_INDEX = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+
+
+def encode(start, end, flags=QUIET):
+    return start | end << 6 | flags << 12
+
+
+def start_square(move):
+    return move & 63
+
+
+def end_square(move):
+    return move >> 6 & 63
+
+
+def move_flags(move):
+    return move >> 12
+
+
+def is_capture(move):
+    return move >> 14 & 1
+
+
+def is_promotion(move):
+    return move >> 15
+
+
+def is_quiet(move):
+    """
+    Neither a capture nor a promotion.
+    """
+    return move < CAPTURE << 12
+
+
+def promotion_type(move):
+    """
+    Returns "N", "B", "R" or "Q" for a promotion.
+    """
+    return PROMOTION_TYPES[move >> 12 & 3]
+
+
+def with_promotion(move, promotion_type):
+    """
+    Returns the promotion move with its new piece replaced.
+    """
+    return move & ~(3 << 12) | PROMOTION_TYPES.index(promotion_type) << 12
+
+
+def notation(move):
+    """
+    Converts a packed move to coordinate notation (e.g. 'e2e4', 'e7e8q').
+    """
+    text = SQUARE_NAMES[move & 63] + SQUARE_NAMES[move >> 6 & 63]
+    if move >> 15:
+        text += promotion_type(move).lower()
+    return text
+
+
+class MoveIndex:
+    """
+    The legal moves of a position looked up by square, so the UI and the
+    text front ends find a move or a piece's destinations without scanning
+    the whole list.
+    """
+    __slots__ = ("moves", "by_start", "by_squares")
+
+    def __init__(self, moves):
+        self.moves = moves
+        self.by_start = {}  # Start square -> moves from it
+        self.by_squares = {}  # (start, end, promotion type or None) -> move
+        for move in moves:
+            start = move & 63
+            self.by_start.setdefault(start, []).append(move)
+            self.by_squares[start, move >> 6 & 63, promotion_type(move) if move >> 15 else None] = move
+
+    def from_square(self, sq):
+        return self.by_start.get(sq, ())
+
+    def targets(self, sq):
+        """
+        Returns the end squares of the moves from sq.
+        """
+        return {move >> 6 & 63 for move in self.by_start.get(sq, ())}
+
+    def find(self, start, end, promotion=None):
+        """
+        Returns the legal move from start to end, or None. A promotion is
+        only found with its new piece given ("N", "B", "R" or "Q"), which
+        other moves ignore.
+        """
+        move = self.by_squares.get((start, end, None))
+        if move is None and promotion is not None:
+            move = self.by_squares.get((start, end, promotion))
+        return move
+
+
 class Move:
     """
     Represents a chess move with start and end positions, and metadata.
     """
+    __slots__ = ("value", "move_id", "start_row", "start_col", "end_row", "end_col",
+                 "piece_moved", "piece_captured", "is_pawn_promotion", "is_enpassant",
+                 "is_castle", "promotion_type")
+
     ranks_to_rows = {"1": 7, "2": 6, "3": 5,
                      "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
@@ -13,36 +135,72 @@ class Move:
                      "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_sq, end_sq, board, is_enpassant=False, is_castle=False):
-        self.start_row = start_sq[0]
-        self.start_col = start_sq[1]
-        self.end_row = end_sq[0]
-        self.end_col = end_sq[1]
+    def __init__(self, start_sq, end_sq, board, promotion_type=None):
+        """
+        Builds the move of the piece on start_sq to end_sq on the given
+        board[row][col] view, working out the flags from the pieces.
+        """
+        self.start_row, self.start_col = start_sq
+        self.end_row, self.end_col = end_sq
         self.piece_moved = board[self.start_row][self.start_col]
         self.piece_captured = board[self.end_row][self.end_col]
-        # Pawn Promotion
-        self.is_pawn_promotion = ((self.piece_moved == "wP" and self.end_row == 0) or (
-            self.piece_moved == "bP" and self.end_row == 7))
 
-        # Enpassant
-        self.is_enpassant = is_enpassant
-        if is_enpassant:
-            self.piece_captured = "bP" if self.piece_moved == "wP" else "wP"
+        flags = QUIET
+        if self.piece_captured != "--":
+            flags = CAPTURE
+        if self.piece_moved[1] == "P":
+            if abs(self.end_row - self.start_row) == 2:
+                flags = DOUBLE_PAWN_PUSH
+            elif self.start_col != self.end_col and self.piece_captured == "--":
+                flags = EN_PASSANT
+                self.piece_captured = ("b" if self.piece_moved[0] == "w" else "w") + "P"
+            elif self.end_row == 0 or self.end_row == 7:
+                # Pawn Promotion, defaults to a queen
+                flags |= PROMOTION | PROMOTION_TYPES.index(promotion_type or "Q")
+        elif self.piece_moved[1] == "K" and abs(self.end_col - self.start_col) == 2:
+            flags = KING_CASTLE if self.end_col > self.start_col else QUEEN_CASTLE
+
+        self.set_value(encode(self.start_row * 8 + self.start_col,
+                              self.end_row * 8 + self.end_col, flags))
 
-        # Castle move
-        self.is_castle = is_castle
+    @classmethod
+    def from_int(cls, value, board):
+        """
+        Wraps a packed move, reading the piece names from the board before
+        the move is made.
+        """
+        move = cls.__new__(cls)
+        move.start_row, move.start_col = divmod(start_square(value), 8)
+        move.end_row, move.end_col = divmod(end_square(value), 8)
+        move.piece_moved = board[move.start_row][move.start_col]
+        move.piece_captured = board[move.end_row][move.end_col]
+        if move_flags(value) == EN_PASSANT:
+            move.piece_captured = ("b" if move.piece_moved[0] == "w" else "w") + "P"
+        move.set_value(value)
+        return move
 
-        self.move_id = self.start_row * 1000 + self.start_col * \
-            100 + self.end_row * 10 + self.end_col
+    def set_value(self, value):
+        flags = move_flags(value)
+        self.value = value
+        self.move_id = value
+        self.is_pawn_promotion = bool(flags & PROMOTION)
+        self.is_enpassant = flags == EN_PASSANT
+        self.is_castle = flags == KING_CASTLE or flags == QUEEN_CASTLE
+        self.promotion_type = promotion_type(value) if self.is_pawn_promotion else None
 
     def __eq__(self, other):
-        return isinstance(other, Move) and self.move_id == other.move_id
+        if isinstance(other, Move):
+            return self.value == other.value
+        return isinstance(other, int) and self.value == other
+
+    def __hash__(self):
+        return hash(self.value)
 
     def get_chess_notation(self):
         """
         Converts the move to standard chess notation.
         """
-        return self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col)
+        return notation(self.value)
 
     def get_rank_file(self, row, col):
         """
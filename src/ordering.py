@@ -0,0 +1,98 @@
+'''
+Move ordering for the alpha-beta search.
+
+Moves are sorted by an integer key: the hash (PV) move first, then captures
+by most valuable victim / least valuable attacker, then the two killer
+moves of the ply, then quiet moves by their history score. The search
+itself gets its moves in this order from GameState.generate_staged_moves,
+fed with the killer and history tables kept here.
+'''
+
+from bitboard import EMPTY, PAWN
+from move import is_quiet, EN_PASSANT, PROMOTION
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 26
+PROMOTION_SCORE = 1 << 25
+FIRST_KILLER_SCORE = 1 << 24
+SECOND_KILLER_SCORE = FIRST_KILLER_SCORE - 1
+HISTORY_LIMIT = 1 << 20  # Keeps history scores below the killers
+
+
+def capture_score(squares, move):
+    """
+    Returns the ordering score of a capture or promotion: most valuable
+    victim first, then least valuable attacker. 0 for other moves.
+    """
+    flags = move >> 12
+    victim = squares[move >> 6 & 63]
+    score = 0
+    if victim != EMPTY:
+        # Piece types run pawn (0) to king (5)
+        score = CAPTURE_SCORE + (victim % 6) * 8 + 5 - squares[move & 63] % 6
+    elif flags == EN_PASSANT:
+        score = CAPTURE_SCORE + PAWN * 8 + 5
+    if flags & PROMOTION:
+        # Knight (0) up to queen (3)
+        return score + PROMOTION_SCORE + (flags & 3)
+    return score
+
+
+class MoveOrderer:
+    """
+    Holds the killer and history tables of a search and sorts packed moves
+    with them.
+    """
+
+    def __init__(self, max_ply):
+        self.killers = [[0, 0] for _ in range(max_ply)]
+        # history[color][from_square + to_square * 64], the low 12 bits of a move
+        self.history = [[0] * 4096 for _ in range(2)]
+
+    def order(self, game_state, moves, ply, hash_move=0):
+        """
+        Sorts moves in place, the most promising first.
+        """
+        squares = game_state.bitboards.squares
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history[0 if game_state.white_to_move else 1]
+
+        def key(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            score = capture_score(squares, move)
+            if score:
+                return score
+            if move == killer_1:
+                return FIRST_KILLER_SCORE
+            if move == killer_2:
+                return SECOND_KILLER_SCORE
+            return history[move & 4095]
+
+        moves.sort(key=key, reverse=True)
+
+    def record_cutoff(self, game_state, move, ply, depth):
+        """
+        Remembers a quiet move that caused a beta cutoff as a killer for the
+        ply and rewards it in the history table.
+        """
+        if not is_quiet(move):
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[0 if game_state.white_to_move else 1]
+        index = move & 4095
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            self.age_history()
+
+    def age_history(self):
+        """
+        Halves every history score, keeping their order but letting newer
+        cutoffs matter more.
+        """
+        for history in self.history:
+            for i in range(4096):
+                history[i] >>= 1
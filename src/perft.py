@@ -0,0 +1,123 @@
+'''
+Perft: counts the leaf nodes of the legal move tree to a fixed depth.
+
+Used both as a correctness check for move generation (the counts for the
+reference positions are well known) and as its benchmark.
+
+    python src/perft.py --depth 4
+    python src/perft.py --depth 3 --divide --fen "<fen>"
+    python src/perft.py --suite --depth 3
+'''
+
+import argparse
+import time
+
+from engine import GameState
+from move import notation
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# (name, fen, node counts for depth 1, 2, ...)
+REFERENCE_POSITIONS = [
+    ("start", START_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+def perft(game_state, depth):
+    """
+    Returns the number of leaf nodes depth plies below the current position.
+    """
+    moves = game_state.get_valid_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        game_state.make_move(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undo_move()
+    return nodes
+
+
+def divide(game_state, depth):
+    """
+    Returns {move notation: leaf node count} for every root move.
+    """
+    counts = {}
+    for move in game_state.get_valid_moves():
+        game_state.make_move(move)
+        counts[notation(move)] = perft(game_state, depth - 1)
+        game_state.undo_move()
+    return counts
+
+
+def timed_perft(game_state, depth, show_divide=False):
+    """
+    Runs perft (optionally with a divide breakdown) and returns
+    (nodes, seconds).
+    """
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(game_state, depth)
+        for move_text in sorted(counts):
+            print(f"{move_text}: {counts[move_text]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game_state, depth)
+    return nodes, time.perf_counter() - start
+
+
+def format_result(depth, nodes, seconds):
+    nps = nodes / seconds if seconds > 0 else 0
+    return f"depth {depth}  nodes {nodes}  time {seconds:.3f}s  nps {nps:,.0f}"
+
+
+def run_suite(max_depth):
+    """
+    Runs every reference position up to max_depth and checks the counts.
+    Returns True when all of them match.
+    """
+    all_passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            nodes, seconds = timed_perft(GameState.from_fen(fen), depth)
+            total_nodes += nodes
+            total_seconds += seconds
+            passed = nodes == expected[depth - 1]
+            all_passed = all_passed and passed
+            status = "ok" if passed else f"FAILED (expected {expected[depth - 1]})"
+            print(f"{name:<10} {format_result(depth, nodes, seconds)}  {status}")
+    print(f"total      nodes {total_nodes}  time {total_seconds:.3f}s  "
+          f"nps {total_nodes / total_seconds if total_seconds > 0 else 0:,.0f}")
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fen", default=START_FEN, help="Position to search from")
+    parser.add_argument("--divide", action="store_true", help="Show the count for every root move")
+    parser.add_argument("--suite", action="store_true", help="Check the reference positions")
+    args = parser.parse_args()
+
+    if args.suite:
+        raise SystemExit(0 if run_suite(args.depth) else 1)
+
+    nodes, seconds = timed_perft(GameState.from_fen(args.fen), args.depth, args.divide)
+    print(format_result(args.depth, nodes, seconds))
+
+
+if __name__ == "__main__":
+    main()
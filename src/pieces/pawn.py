@@ -3,56 +3,44 @@ Pawn class generates all possible moves for a pawn piece on the board.
 '''
 
 from pieces.piece import Piece
-from move import Move
+from pieces.tables import PAWN_PUSHES, PAWN_DOUBLE_PUSHES, PAWN_CAPTURES
+from move import PROMOTION
+from bitboard import EMPTY, FULL
 
 
 class Pawn(Piece):
-    def __init__(self, board, white_to_move, enpassant_possible):
-        super().__init__(board, white_to_move)
-        self.enpassant_possible = enpassant_possible
-
-    def get_moves(self, row, col):
-        if row + 1 <= 7:
-            moves = []
-            if self.white_to_move:
-                if self.board[row - 1][col] == "--":  # One square pawn advance
-                    moves.append(Move((row, col), (row - 1, col), self.board))
-                    # Two square pawn advance
-                    if row == 6 and self.board[row - 2][col] == "--":
-                        moves.append(Move((row, col), (row - 2, col), self.board))
-
-                # Captures to the left
-                # Enemy piece on the diagonal
-                if col - 1 >= 0 and self.board[row - 1][col - 1][0] == "b":
-                    moves.append(Move((row, col), (row - 1, col - 1), self.board))
-                # Possible enpassant
-                elif col - 1 >= 0 and (row - 1, col - 1) == self.enpassant_possible:
-                    moves.append(Move((row, col), (row - 1, col - 1),
-                                self.board, is_enpassant=True))
-
-                # Captures to the right
-                if col + 1 <= 7 and self.board[row - 1][col + 1][0] == "b":
-                    moves.append(Move((row, col), (row - 1, col + 1), self.board))
-                elif col + 1 <= 7 and (row - 1, col + 1) == self.enpassant_possible:
-                    moves.append(Move((row, col), (row - 1, col + 1),
-                                self.board, is_enpassant=True))
-            else:
-                if self.board[row + 1][col] == "--":
-                    moves.append(Move((row, col), (row + 1, col), self.board))
-                    if row == 1 and self.board[row + 2][col] == "--":
-                        moves.append(Move((row, col), (row + 2, col), self.board))
-
-                # Captures to the left
-                if col - 1 >= 0 and self.board[row + 1][col - 1][0] == "w":
-                    moves.append(Move((row, col), (row + 1, col - 1), self.board))
-                elif col - 1 >= 0 and (row + 1, col - 1) == self.enpassant_possible:
-                    moves.append(Move((row, col), (row + 1, col - 1),
-                                self.board, is_enpassant=True))
-
-                # Captures to the right
-                if col + 1 <= 7 and self.board[row + 1][col + 1][0] == "w":
-                    moves.append(Move((row, col), (row + 1, col + 1), self.board))
-                elif col + 1 <= 7 and (row + 1, col + 1) == self.enpassant_possible:
-                    moves.append(Move((row, col), (row + 1, col + 1),
-                                self.board, is_enpassant=True))
-            return moves
+    def get_moves(self, bitboards, color, start, moves, target_mask=FULL, enpassant_sq=-1):
+        squares = bitboards.squares
+
+        end, move, _ = PAWN_PUSHES[color][start]
+        if squares[end] == EMPTY:  # One square pawn advance
+            if target_mask >> end & 1:
+                self.add_move(moves, end, move)
+            # Two square pawn advance
+            double_push = PAWN_DOUBLE_PUSHES[color][start]
+            if double_push:
+                jump, move = double_push
+                if squares[jump] == EMPTY and target_mask >> jump & 1:
+                    moves.append(move)
+
+        # Captures to the left and to the right
+        for end, capture, enpassant in PAWN_CAPTURES[color][start]:
+            victim = squares[end]
+            # Enemy piece on the diagonal
+            if victim != EMPTY:
+                if victim // 6 != color and target_mask >> end & 1:
+                    self.add_move(moves, end, capture)
+            # Possible enpassant, legality is checked by the caller
+            elif end == enpassant_sq:
+                moves.append(enpassant)
+
+    def add_move(self, moves, end, move):
+        """
+        Adds a pawn move, expanding it into one move per promotion piece
+        (queen first) when it reaches the last rank.
+        """
+        if end < 8 or end >= 56:
+            for promotion in (3, 2, 1, 0):
+                moves.append(move | (PROMOTION | promotion) << 12)
+        else:
+            moves.append(move)
@@ -1,11 +1,50 @@
 '''
-class Piece represents a chess piece with a color and position.
+class Piece generates the moves of one kind of chess piece.
+
+Pieces hold no position state: the engine keeps a single instance of each
+and passes the board, the side to move and the square in every call.
 '''
 
+from bitboard import EMPTY, FULL
+
+
 class Piece:
-    def __init__(self, board, white_to_move):
-        self.board = board
-        self.white_to_move = white_to_move
+    def get_moves(self, bitboards, color, start, moves, target_mask=FULL):
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+
+class SteppingPiece(Piece):
+    """
+    A piece moving a single step to any of the squares in its move table.
+    """
+    move_table = None
+
+    def get_moves(self, bitboards, color, start, moves, target_mask=FULL):
+        squares = bitboards.squares
+        for end, quiet, capture in self.move_table[start]:
+            if target_mask >> end & 1:
+                victim = squares[end]
+                if victim == EMPTY:
+                    moves.append(quiet)
+                elif victim // 6 != color:
+                    moves.append(capture)
+
+
+class SlidingPiece(Piece):
+    """
+    A piece sliding along its rays until it is blocked.
+    """
+    rays = None
 
-    def get_moves(self, row, col):
-        raise NotImplementedError("This method should be overridden by subclasses")
\ No newline at end of file
+    def get_moves(self, bitboards, color, start, moves, target_mask=FULL):
+        squares = bitboards.squares
+        for ray in self.rays[start]:
+            for end, quiet, capture in ray:
+                victim = squares[end]
+                if victim == EMPTY:
+                    if target_mask >> end & 1:
+                        moves.append(quiet)
+                else:
+                    if victim // 6 != color and target_mask >> end & 1:
+                        moves.append(capture)
+                    break  # We can't jump over a piece
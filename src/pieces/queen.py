@@ -2,15 +2,9 @@
 class Queen gets the moves of the queen piece on the board
 '''
 
-from pieces.piece import Piece
-from pieces.rook import Rook
-from pieces.bishop import Bishop
+from pieces.piece import SlidingPiece
+from pieces.tables import QUEEN_RAYS
 
-class Queen(Piece):
-    def get_moves(self, row, col):
-        moves = []
-        rook = Rook(self.board, self.white_to_move)
-        bishop = Bishop(self.board, self.white_to_move)
-        moves.extend(rook.get_moves(row, col))
-        moves.extend(bishop.get_moves(row, col))
-        return moves
\ No newline at end of file
+
+class Queen(SlidingPiece):
+    rays = QUEEN_RAYS
@@ -0,0 +1,83 @@
+'''
+Move tables for the pieces, computed once at import.
+
+Every entry is (end square, packed quiet move, packed capture) so the
+pieces only look squares up and append ready-made moves:
+
+    KNIGHT_MOVES[sq], KING_MOVES[sq]     single steps
+    ROOK_RAYS[sq], BISHOP_RAYS[sq]       one tuple per direction, nearest square first
+    QUEEN_RAYS[sq]                       the rook and bishop rays together
+    PAWN_PUSHES[color][sq]               one square advance, None on the last rank
+    PAWN_DOUBLE_PUSHES[color][sq]        (end, move) from the starting rank, else None
+    PAWN_CAPTURES[color][sq]             (end, capture, en passant capture) per diagonal
+'''
+
+from bitboard import (KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, DIRECTIONS, WHITE, BLACK,
+                      iter_bits)
+from move import encode, QUIET, DOUBLE_PAWN_PUSH, CAPTURE, EN_PASSANT
+
+
+def _entry(start, end):
+    return end, encode(start, end, QUIET), encode(start, end, CAPTURE)
+
+
+def _step_moves(attacks):
+    return [tuple(_entry(sq, end) for end in iter_bits(attacks[sq])) for sq in range(64)]
+
+
+def _ray_moves(directions):
+    """
+    Builds [square] -> tuple of rays, each ray the entries walking away from
+    the square in one direction. Empty rays (at the edge) are left out.
+    """
+    table = []
+    for sq in range(64):
+        rays = []
+        for d_row, d_col in directions:
+            row, col = divmod(sq, 8)
+            ray = []
+            row += d_row
+            col += d_col
+            while 0 <= row < 8 and 0 <= col < 8:
+                ray.append(_entry(sq, row * 8 + col))
+                row += d_row
+                col += d_col
+            if ray:
+                rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return table
+
+
+def _pawn_moves(color):
+    direction = -8 if color == WHITE else 8
+    start_row = 6 if color == WHITE else 1
+    pushes = []
+    double_pushes = []
+    captures = []
+    for sq in range(64):
+        end = sq + direction
+        if 0 <= end < 64:
+            pushes.append(_entry(sq, end))
+        else:
+            pushes.append(None)
+        if sq // 8 == start_row:
+            double_pushes.append((end + direction, encode(sq, end + direction, DOUBLE_PAWN_PUSH)))
+        else:
+            double_pushes.append(None)
+        captures.append(tuple((end, encode(sq, end, CAPTURE), encode(sq, end, EN_PASSANT))
+                              for end in iter_bits(PAWN_ATTACKS[color][sq])))
+    return pushes, double_pushes, captures
+
+
+KNIGHT_MOVES = _step_moves(KNIGHT_ATTACKS)
+KING_MOVES = _step_moves(KING_ATTACKS)
+
+ROOK_RAYS = _ray_moves(DIRECTIONS[:4])
+BISHOP_RAYS = _ray_moves(DIRECTIONS[4:])
+QUEEN_RAYS = [ROOK_RAYS[sq] + BISHOP_RAYS[sq] for sq in range(64)]
+
+_WHITE_PAWNS = _pawn_moves(WHITE)
+_BLACK_PAWNS = _pawn_moves(BLACK)
+PAWN_PUSHES = [_WHITE_PAWNS[0], _BLACK_PAWNS[0]]
+PAWN_DOUBLE_PUSHES = [_WHITE_PAWNS[1], _BLACK_PAWNS[1]]
+PAWN_CAPTURES = [_WHITE_PAWNS[2], _BLACK_PAWNS[2]]
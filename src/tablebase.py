@@ -0,0 +1,325 @@
+'''
+Endgame tablebases: distance to mate for every position of king and queen,
+king and rook, and king and pawn against a lone king (KQK, KRK, KPK).
+
+Tables are generated by retrograde analysis. Starting from the checkmates,
+every position the winning side can move into a lost position from is won,
+and every position of the losing side whose moves all lead into won
+positions is lost, one ply further from mate each round. Positions never
+reached are draws. Pawn promotions lead into the KQK and KRK tables, which
+are solved first.
+
+Each table is a file of 2 * 64^3 bytes, one per (white king, black king,
+piece) square triple, first for white to move and then for black to move,
+with the stronger side always white. A byte is 0 for a draw (or an illegal
+position), otherwise the number of plies to mate plus one; white wins the
+positions of the first half and black loses those of the second. The files
+are memory mapped for probing. Positions where black has the piece are
+looked up with the board mirrored.
+
+    python src/tablebase.py generate
+    python src/tablebase.py probe --fen "8/8/8/4k3/8/8/8/4K2R w - - 0 1"
+'''
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import time
+
+from bitboard import (iter_bits, rook_attacks, bishop_attacks, KING_ATTACKS, PAWN_ATTACKS, WHITE, BLACK, PAWN,
+                      KNIGHT, BISHOP, ROOK, QUEEN, KING)
+
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tablebases")
+# Name of each table by the type of its piece, solved in this order
+TABLES = {QUEEN: "KQK", ROOK: "KRK", PAWN: "KPK"}
+SIZE = 64 * 64 * 64
+MAX_PIECES = 3
+
+
+def index(white_king, black_king, piece):
+    return white_king << 12 | black_king << 6 | piece
+
+
+def piece_attacks(piece_type, sq, occupied):
+    """
+    Returns the squares the white piece on sq attacks.
+    """
+    if piece_type == QUEEN:
+        return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+    if piece_type == ROOK:
+        return rook_attacks(sq, occupied)
+    return PAWN_ATTACKS[WHITE][sq]
+
+
+'''
+Generation
+
+Workers list the moves of every position with the white king on one square.
+Moves are edges between position indices, white to move (w) and black to
+move (b); promotions and captures of the piece leave the table.
+
+NumPy is only imported here, so probing the tables doesn't load it.
+'''
+
+
+def generate_moves(task):
+    """
+    Returns the moves of the positions with the white king on white_king:
+    (legal w, legal b, black in check, w -> b edges, b -> w edges, black
+    moves leaving the table per b position, promotions as (w position,
+    piece type, b position in that table)).
+    """
+    import numpy as np
+
+    piece_type, white_king = task
+    legal_w = np.zeros(64 * 64, dtype=bool)
+    legal_b = np.zeros(64 * 64, dtype=bool)
+    in_check = np.zeros(64 * 64, dtype=bool)
+    exits_b = np.zeros(64 * 64, dtype=np.int8)
+    w_src, b_dst, b_src, w_dst = [], [], [], []
+    promotions = []
+    white_king_area = KING_ATTACKS[white_king] | 1 << white_king
+    for black_king in range(64):
+        if white_king_area >> black_king & 1:
+            continue
+        black_king_area = KING_ATTACKS[black_king]
+        for piece in range(64):
+            if piece == white_king or piece == black_king:
+                continue
+            if piece_type == PAWN and (piece < 8 or piece >= 56):
+                continue
+            position = index(white_king, black_king, piece)
+            local = black_king << 6 | piece
+            attacks = piece_attacks(piece_type, piece, 1 << white_king | 1 << black_king)
+            check = attacks >> black_king & 1
+            legal_b[local] = True
+            in_check[local] = check
+
+            # White to move, only legal with black out of check
+            if not check:
+                legal_w[local] = True
+                for to in iter_bits(KING_ATTACKS[white_king] & ~black_king_area & ~(1 << piece)):
+                    w_src.append(position)
+                    b_dst.append(index(to, black_king, piece))
+                if piece_type == PAWN:
+                    to = piece - 8
+                    if to != white_king and to != black_king:
+                        if to < 8:
+                            promotions.append((position, QUEEN, index(white_king, black_king, to)))
+                            promotions.append((position, ROOK, index(white_king, black_king, to)))
+                        else:
+                            w_src.append(position)
+                            b_dst.append(index(white_king, black_king, to))
+                            if piece >= 48 and to - 8 != white_king and to - 8 != black_king:
+                                w_src.append(position)
+                                b_dst.append(index(white_king, black_king, to - 8))
+                else:
+                    for to in iter_bits(attacks & ~(1 << white_king | 1 << black_king)):
+                        w_src.append(position)
+                        b_dst.append(index(white_king, black_king, to))
+
+            # Black to move: the king can't stay next to the white king or
+            # step onto a square the piece attacks once the king has left
+            guarded = piece_attacks(piece_type, piece, 1 << white_king) | white_king_area
+            for to in iter_bits(black_king_area & ~guarded):
+                if to == piece:
+                    exits_b[local] += 1  # Takes the piece: a draw
+                else:
+                    b_src.append(position)
+                    w_dst.append(index(white_king, to, piece))
+    return (legal_w, legal_b, in_check, np.array(w_src, dtype=np.int32), np.array(b_dst, dtype=np.int32),
+            np.array(b_src, dtype=np.int32), np.array(w_dst, dtype=np.int32), exits_b, promotions)
+
+
+def predecessors(edges_dst, edges_src, size):
+    """
+    Groups edges by destination: returns (sources sorted by destination,
+    offset of each destination's group).
+    """
+    import numpy as np
+
+    order = np.argsort(edges_dst, kind="stable")
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges_dst, minlength=size), out=offsets[1:])
+    return edges_src[order], offsets
+
+
+def gather(sources, offsets, nodes):
+    """
+    Returns the concatenated groups of the nodes.
+    """
+    import numpy as np
+
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=sources.dtype)
+    ends = np.cumsum(lengths)
+    return sources[np.repeat(starts - ends + lengths, lengths) + np.arange(total)]
+
+
+def solve(chunks, solved):
+    """
+    Runs the retrograde analysis on the moves of every white king square.
+    solved holds the tables promotions lead into. Returns the table bytes.
+    """
+    import numpy as np
+
+    legal_w = np.concatenate([chunk[0] for chunk in chunks])
+    legal_b = np.concatenate([chunk[1] for chunk in chunks])
+    in_check = np.concatenate([chunk[2] for chunk in chunks])
+    w_src = np.concatenate([chunk[3] for chunk in chunks])
+    b_dst = np.concatenate([chunk[4] for chunk in chunks])
+    b_src = np.concatenate([chunk[5] for chunk in chunks])
+    w_dst = np.concatenate([chunk[6] for chunk in chunks])
+    exits_b = np.concatenate([chunk[7] for chunk in chunks])
+
+    # Plies to mate of the best promotion of each w position
+    promotion_plies = np.zeros(SIZE, dtype=np.int32)
+    for chunk in chunks:
+        for position, piece_type, target in chunk[8]:
+            value = solved[piece_type][SIZE + target]
+            if value and (not promotion_plies[position] or value < promotion_plies[position]):
+                promotion_plies[position] = value  # One ply more than the mate in value - 1
+
+    # Black moves left that don't lead into a won position
+    moves_left = np.bincount(b_src, minlength=SIZE).astype(np.int32) + exits_b
+    w_predecessors, w_offsets = predecessors(b_dst, w_src, SIZE)
+    b_predecessors, b_offsets = predecessors(w_dst, b_src, SIZE)
+
+    value_w = np.zeros(SIZE, dtype=np.uint8)
+    value_b = np.zeros(SIZE, dtype=np.uint8)
+    lost = np.flatnonzero(legal_b & in_check & (moves_left == 0))
+    value_b[lost] = 1
+    plies = 0
+    last_promotion = int(promotion_plies.max())
+    while len(lost) or plies < last_promotion:
+        plies += 1
+        won = np.concatenate([gather(w_predecessors, w_offsets, lost), np.flatnonzero(promotion_plies == plies)])
+        won = np.unique(won)
+        won = won[value_w[won] == 0]
+        value_w[won] = plies + 1
+        plies += 1
+        decrements = np.bincount(gather(b_predecessors, b_offsets, won), minlength=SIZE)
+        moves_left -= decrements.astype(np.int32)
+        lost = np.flatnonzero((decrements > 0) & (moves_left == 0) & (value_b == 0))
+        value_b[lost] = plies + 1
+    return np.concatenate([value_w * legal_w, value_b * legal_b]).astype(np.uint8)
+
+
+def generate(directory=TABLEBASE_DIR, workers=None):
+    """
+    Generates every table into directory, listing moves in parallel.
+    """
+    import numpy as np
+
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(piece_type, white_king) for piece_type in TABLES for white_king in range(64)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        chunks = pool.map(generate_moves, tasks)
+    print(f"moves listed in {time.perf_counter() - start:.1f}s")
+    solved = {}
+    for number, (piece_type, name) in enumerate(TABLES.items()):
+        table_start = time.perf_counter()
+        solved[piece_type] = table = solve(chunks[number * 64:number * 64 + 64], solved)
+        table.tofile(os.path.join(directory, name + ".bin"))
+        longest = int(table.max()) - 1
+        print(f"{name}: {np.count_nonzero(table[:SIZE])} wins, longest mate {longest} plies, "
+              f"solved in {time.perf_counter() - table_start:.1f}s")
+
+
+'''
+Probing
+'''
+
+
+class Tablebases:
+    def __init__(self, directory=TABLEBASE_DIR):
+        self.tables = {}
+        self.files = []
+        for piece_type, name in TABLES.items():
+            path = os.path.join(directory, name + ".bin")
+            if os.path.exists(path):
+                file = open(path, "rb")
+                self.files.append(file)
+                self.tables[piece_type] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __bool__(self):
+        return bool(self.tables)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        for file in self.files:
+            file.close()
+        self.tables = {}
+        self.files = []
+
+    def probe(self, game_state):
+        """
+        Returns (result, plies to mate) for the side to move, result being
+        1 for a win, -1 for a loss and 0 for a draw, or None when the
+        position is not covered.
+        """
+        bitboards = game_state.bitboards
+        occupied = bitboards.occupied
+        pieces = 0
+        while occupied:
+            occupied &= occupied - 1
+            pieces += 1
+            if pieces > MAX_PIECES:
+                return None
+        if pieces == 2:
+            return 0, 0
+        for piece in range(12):
+            if piece % 6 != KING and bitboards.pieces[piece]:
+                break
+        if piece % 6 in (KNIGHT, BISHOP):
+            return 0, 0  # A lone minor piece can't mate
+        table = self.tables.get(piece % 6)
+        if table is None:
+            return None
+        strong = piece // 6
+        white_king = bitboards.king_square(strong)
+        black_king = bitboards.king_square(strong ^ 1)
+        sq = bitboards.pieces[piece].bit_length() - 1
+        if strong == BLACK:
+            white_king ^= 56
+            black_king ^= 56
+            sq ^= 56
+        strong_to_move = game_state.white_to_move == (strong == WHITE)
+        value = table[index(white_king, black_king, sq) + (0 if strong_to_move else SIZE)]
+        if not value:
+            return 0, 0
+        return (1 if strong_to_move else -1), value - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or probe the endgame tablebases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="Generate every table")
+    build.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes listing moves")
+    build.add_argument("--directory", default=TABLEBASE_DIR)
+    probe = commands.add_parser("probe", help="Look a position up")
+    probe.add_argument("--fen", required=True)
+    probe.add_argument("--directory", default=TABLEBASE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.directory, args.workers)
+    else:
+        from engine import GameState
+        result = Tablebases(args.directory).probe(GameState.from_fen(args.fen))
+        if result is None:
+            print("not in the tablebases")
+        elif result[0] == 0:
+            print("draw")
+        else:
+            print(f"{'win' if result[0] > 0 else 'loss'} for the side to move, mate in {result[1]} plies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+'''
+Fixed-size transposition table for the search.
+
+Entries live in preallocated arrays sized from a memory budget in MB. Slots
+are grouped in buckets of two: the first slot keeps the deepest result
+(depth-preferred), the second always takes the newest one. Entries written
+during an earlier search (a different age) can always be replaced.
+
+A table can be created in shared memory for the parallel search, where
+several processes probe and store without locks. Each slot keeps its key
+XORed with its data, so a slot torn by two writers at once no longer
+matches either key and is simply a miss.
+'''
+
+import ctypes
+from array import array
+from multiprocessing.sharedctypes import RawArray
+
+# Bound types
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high, the score is at least this
+UPPER_BOUND = 2  # The search failed low, the score is at most this
+
+# key (8 bytes) + data (8 bytes): score << 32 | move << 16 | age << 10 | bound << 8 | depth
+ENTRY_SIZE = 16
+AGE_MASK = 0x3F
+SCORE_OFFSET = 1 << 31  # Scores are stored unsigned
+
+
+class TranspositionTable:
+    """
+    Maps position hashes to (depth, score, bound, best move).
+    """
+
+    def __init__(self, size_mb=16, shared=False):
+        buckets = 1
+        while buckets * 4 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            buckets *= 2
+        self.size = buckets * 2
+        self.bucket_mask = buckets - 1
+        # Shared tables live in memory handed on to worker processes
+        self.memory = RawArray(ctypes.c_uint64, 2 * self.size) if shared else None
+        self.allocate()
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def allocate(self):
+        if self.memory is None:
+            self.keys = array("Q", bytes(8 * self.size))
+            self.data = array("Q", bytes(8 * self.size))
+        else:
+            ctypes.memset(self.memory, 0, 16 * self.size)
+            self.attach()
+
+    def attach(self):
+        view = memoryview(self.memory).cast("B").cast("Q")
+        self.keys = view[:self.size]
+        self.data = view[self.size:]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["keys"], state["data"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.memory is None:
+            self.allocate()
+        else:
+            self.attach()
+
+    def new_search(self):
+        """
+        Advances the age counter, so entries from earlier searches get
+        evicted first.
+        """
+        self.age = (self.age + 1) & AGE_MASK
+
+    def clear(self):
+        self.allocate()
+        self.age = 0
+        self.hits = self.misses = self.collisions = 0
+
+    def probe(self, key):
+        """
+        Returns (depth, score, bound, move) stored for key, or None.
+        """
+        index = (key & self.bucket_mask) << 1
+        keys = self.keys
+        data = self.data
+        entry = data[index]
+        if keys[index] ^ entry == key:
+            self.hits += 1
+            return self.unpack(entry)
+        entry = data[index + 1]
+        if keys[index + 1] ^ entry == key:
+            self.hits += 1
+            return self.unpack(entry)
+        self.misses += 1
+        if data[index] or entry:
+            self.collisions += 1  # The bucket is in use by other positions
+        return None
+
+    def unpack(self, data):
+        return data & 0xFF, (data >> 32) - SCORE_OFFSET, data >> 8 & 0x3, data >> 16 & 0xFFFF
+
+    def store(self, key, depth, score, bound, move=0):
+        """
+        Stores a search result. The depth-preferred slot is used when the
+        new result is at least as deep, the old one is stale, or it belongs
+        to the same position; otherwise the always-replace slot is used.
+        """
+        index = (key & self.bucket_mask) << 1
+        data = self.data[index]
+        if (self.keys[index] ^ data != key and data & 0xFF > depth and
+                data >> 10 & AGE_MASK == self.age):
+            index += 1
+            data = self.data[index]
+        # Keep the known best move when a shallower result has none
+        if not move and self.keys[index] ^ data == key:
+            move = data >> 16 & 0xFFFF
+        data = ((score + SCORE_OFFSET) << 32 | move << 16 | self.age << 10 | bound << 8 |
+                min(max(depth, 0), 0xFF))
+        self.keys[index] = key ^ data
+        self.data[index] = data
+
+    def hashfull(self):
+        """
+        Returns the permille of the first 1000 slots used in this search.
+        """
+        sample = min(self.size, 1000)
+        used = sum(1 for i in range(sample)
+                   if self.data[i] and self.data[i] >> 10 & AGE_MASK == self.age)
+        return used * 1000 // sample
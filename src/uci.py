@@ -0,0 +1,202 @@
+'''
+Headless UCI (Universal Chess Interface) front end for the engine, so it
+can run without a display and be driven by chess GUIs and tournament tools.
+
+    python src/uci.py
+
+Supported commands: uci, isready, ucinewgame, setoption (Hash, Threads, OwnBook),
+position startpos/fen ... moves ..., go (depth, movetime, wtime, btime,
+winc, binc, movestogo, nodes, infinite), stop and quit. The search runs in
+a thread so stop and isready are answered while it thinks.
+'''
+
+import copy
+import sys
+import threading
+import time
+
+import ai
+from engine import GameState
+from move import notation
+from transposition import TranspositionTable
+
+ENGINE_NAME = "Square Logic"
+ENGINE_AUTHOR = "Princelad"
+MOVES_TO_GO = 30  # Moves the remaining time is shared out over when not told
+MOVE_OVERHEAD = 0.05  # Seconds kept back for sending the move
+MAX_THREADS = 64
+
+
+class StopFlag:
+    """
+    Stop flag for a search running in a thread of this process.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = False
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.game_state = GameState()
+        self.workers = ai.WORKERS
+        self.hash_mb = ai.HASH_SIZE_MB
+        self.own_book = True
+        self.search_thread = None
+        self.stop_flag = None
+
+    def send(self, line):
+        print(line, file=self.output, flush=True)
+
+    def loop(self, lines=sys.stdin):
+        for line in lines:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        """
+        Handles one command. Returns False on quit.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {ai.HASH_SIZE_MB} min 1 max 4096")
+            self.send(f"option name Threads type spin default {self.workers} min 1 max {MAX_THREADS}")
+            self.send("option name OwnBook type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            ai.transposition_table.clear()
+            if ai.shared_table is not None:
+                ai.shared_table.clear()
+            self.game_state = GameState()
+        elif command == "setoption":
+            self.set_option(tokens)
+        elif command == "position":
+            self.stop()
+            self.set_position(tokens)
+        elif command == "go":
+            self.stop()
+            self.go(tokens)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            return False
+        return True
+
+    def set_option(self, tokens):
+        # setoption name <name> value <value>
+        if "name" not in tokens or "value" not in tokens:
+            return
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = tokens[tokens.index("value") + 1]
+        self.stop()
+        if name == "hash":
+            self.hash_mb = max(int(value), 1)
+            ai.transposition_table = TranspositionTable(self.hash_mb)
+            self.start_workers()  # With a shared table of the new size
+        elif name == "threads":
+            self.workers = min(max(int(value), 1), MAX_THREADS)
+            self.start_workers()
+        elif name == "ownbook":
+            self.own_book = value.lower() == "true"
+
+    def start_workers(self):
+        # Forked from this thread, between reads: a process forked while
+        # another thread waits on stdin would hang closing its copy of it
+        if self.workers > 1:
+            ai.start_workers(self.workers, self.hash_mb)
+
+    def set_position(self, tokens):
+        # position [startpos | fen <fen>] [moves <move> ...]
+        moves_index = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if len(tokens) > 1 and tokens[1] == "fen":
+            game_state = GameState.from_fen(" ".join(tokens[2:moves_index]))
+        else:
+            game_state = GameState()
+        for text in tokens[moves_index + 1:]:
+            move = game_state.parse_move(text)
+            if move is None:
+                self.send(f"info string illegal move {text}")
+                break
+            game_state.make_move(move)
+        self.game_state = game_state
+
+    def go(self, tokens):
+        params = {}
+        for name, value in zip(tokens[1:], tokens[2:]):
+            if name in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes"):
+                params[name] = int(value)
+        time_limit = None
+        if "movetime" in params:
+            time_limit = params["movetime"] / 1000
+        elif "infinite" not in tokens:
+            side = "w" if self.game_state.white_to_move else "b"
+            if side + "time" in params:
+                remaining = params[side + "time"] / 1000
+                increment = params.get(side + "inc", 0) / 1000
+                share = remaining / params.get("movestogo", MOVES_TO_GO) + increment * 3 / 4
+                time_limit = max(min(share, remaining - MOVE_OVERHEAD), 0.01)
+
+        self.stop_flag = StopFlag()
+        # The search gets its own copy, so a new position can be set up at once
+        self.search_thread = threading.Thread(
+            target=self.search,
+            args=(copy.deepcopy(self.game_state), time_limit, params.get("nodes"),
+                  params.get("depth", ai.MAX_DEPTH), "infinite" in tokens, self.stop_flag),
+            daemon=True)
+        self.search_thread.start()
+
+    def search(self, game_state, time_limit, node_limit, max_depth, infinite, stop_flag):
+        valid_moves = game_state.get_valid_moves()
+        move = None
+        if valid_moves:
+            move = ai.get_best_move(game_state, valid_moves, time_limit, node_limit, max_depth,
+                                    self.workers, stop_flag, self.info, self.own_book)
+        # An infinite search only answers once it is told to stop
+        while infinite and not stop_flag.value:
+            time.sleep(0.01)
+        self.send(f"bestmove {notation(move) if move is not None else '0000'}")
+
+    def info(self, search):
+        elapsed = max(search.elapsed(), 1e-6)
+        score = search.best_score
+        if abs(score) >= ai.CHECKMATE - ai.MAX_PLY:
+            plies = ai.CHECKMATE - abs(score)
+            score_text = f"mate {(plies + 1) // 2 if score > 0 else -(plies // 2)}"
+        else:
+            score_text = f"cp {score}"
+        pv = ai.principal_variation(search.game_state, search.transposition_table, search.best_move,
+                                    search.completed_depth)
+        self.send(f"info depth {search.completed_depth} score {score_text} nodes {search.nodes} "
+                  f"nps {int(search.nodes / elapsed)} time {int(elapsed * 1000)} "
+                  f"hashfull {search.transposition_table.hashfull()} "
+                  f"pv {' '.join(notation(move) for move in pv)}")
+
+    def stop(self):
+        """
+        Stops the running search, which still answers with its best move.
+        """
+        if self.search_thread is not None:
+            self.stop_flag.value = True
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def main():
+    engine = UCIEngine()
+    engine.start_workers()
+    engine.loop()
+
+
+if __name__ == "__main__":
+    main()
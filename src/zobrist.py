@@ -0,0 +1,24 @@
+'''
+Zobrist hashing keys.
+
+A position key is the XOR of one random 64-bit number per (piece, square),
+one for black to move, one per castling rights combination and one per en
+passant file, so a move changes it with a handful of XORs.
+'''
+
+import random
+
+_random = random.Random(0x5A0B2157)
+
+PIECE_KEYS = [[_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+SIDE_KEY = _random.getrandbits(64)  # XORed in when black is to move
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]
+ENPASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+
+
+def castling_index(castle_rights):
+    """
+    Packs a CastleRights object into a 0-15 index for CASTLING_KEYS.
+    """
+    return (castle_rights.wks | castle_rights.wqs << 1 |
+            castle_rights.bks << 2 | castle_rights.bqs << 3)
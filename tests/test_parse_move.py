@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from engine import GameState  # noqa: E402
+from move import notation  # noqa: E402
+
+PROMOTION_FEN = "8/4P3/8/8/8/k7/8/K7 w - - 0 1"
+
+
+def test_parse_move_reads_every_legal_move():
+    game_state = GameState()
+    for move in game_state.get_valid_moves():
+        assert game_state.parse_move(notation(move)) == move
+
+
+def test_parse_move_promotion_suffix_is_case_insensitive():
+    game_state = GameState.from_fen(PROMOTION_FEN)
+    for piece in "nbrq":
+        move = game_state.parse_move("e7e8" + piece)
+        assert move is not None
+        assert game_state.parse_move("e7e8" + piece.upper()) == move
+
+
+def test_parse_move_rejects_missing_or_stray_promotion():
+    assert GameState.from_fen(PROMOTION_FEN).parse_move("e7e8") is None
+    assert GameState().parse_move("e2e4q") is None
+    assert GameState().parse_move("e2e5") is None